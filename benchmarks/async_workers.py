@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+"""
+Compare concurrent throughput of the read endpoints under gunicorn sync workers
+(WSGI, DRF views) and uvicorn workers (ASGI, async views), with a simulated
+per-query database latency (see settings.py in this directory).
+Run from the repo root, with the database settings (DATABASE_* env variables)
+pointing to a loaded database:
+  python benchmarks/async_workers.py --workers 2 --concurrency 64 --latency 0.05
+"""
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = {
+    "sync": ["ensembl_track_api.wsgi:application"],
+    "async": ["--worker-class", "uvicorn.workers.UvicornWorker", "ensembl_track_api.asgi:application"],
+}
+
+def pick_urls(base_url, n_genomes):
+    """
+    Read endpoint URLs for a sample of genomes/tracks in the database.
+    """
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ensembl_track_api.settings")
+    import django
+    django.setup()
+    from tracks.models import Track
+    genome_ids = list(Track.objects.order_by("genome_id").values_list("genome_id", flat=True).distinct()[:n_genomes])
+    if(not genome_ids):
+        sys.exit("No tracks in the database.")
+    track_ids = Track.objects.filter(genome_id__in=genome_ids).values_list("track_id", flat=True)
+    return [f"{base_url}/track_categories/{genome_id}" for genome_id in genome_ids] + \
+        [f"{base_url}/track/{track_id}" for track_id in track_ids]
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while(time.monotonic() < deadline):
+        with socket.socket() as sock:
+            if(sock.connect_ex(("127.0.0.1", port)) == 0):
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+def run_load(urls, concurrency, duration):
+    """
+    Request the urls round-robin from concurrent clients for the given time. Returns latencies (s) and error count.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        nonlocal errors
+        session = requests.Session()
+        i = offset
+        while(time.monotonic() < deadline):
+            start = time.perf_counter()
+            response = session.get(urls[i % len(urls)])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors += response.status_code != 200
+            i += 1
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    return latencies, errors
+
+def benchmark(mode, args, urls):
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "BENCHMARK_DB_LATENCY": str(args.latency),
+        "ASYNC_VIEWS": "1" if mode == "async" else "",
+        "TRACK_CACHE_BACKEND": "", #every request goes to the database
+    }
+    command = ["gunicorn", "--workers", str(args.workers), "--bind", f"127.0.0.1:{args.port}", *SERVERS[mode]]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        run_load(urls, args.concurrency, 1) #warm-up
+        latencies, errors = run_load(urls, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    print(f"{mode:>6}: {len(latencies) / args.duration:8.1f} req/s, "
+        f"median {statistics.median(latencies) * 1000:7.1f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms, errors: {errors}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare read throughput under sync (WSGI) and async (ASGI) workers.")
+    parser.add_argument("--workers", type=int, default=2, help="Nr of server worker processes.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Nr of concurrent clients.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated latency of each SQL query (seconds).")
+    parser.add_argument("--duration", type=float, default=10, help="Duration of each run (seconds).")
+    parser.add_argument("--genomes", type=int, default=10, help="Nr of genomes to request.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--modes", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+    urls = pick_urls(f"http://127.0.0.1:{args.port}", args.genomes)
+    print(f"{len(urls)} urls, {args.workers} workers, {args.concurrency} clients, {args.latency * 1000:.0f} ms per query")
+    for mode in args.modes:
+        benchmark(mode, args, urls)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+
+"""
+Compare two result files of the benchmark management command and flag regressions
+(latency or SQL queries per request increased more than the threshold):
+  python benchmarks/compare.py before.json after.json --threshold 0.2
+Exits with status 1 when a regression is found.
+"""
+
+METRICS = ["p50_ms", "p90_ms", "p99_ms", "queries"]
+
+def compare(old, new, threshold):
+    regressions = []
+    for endpoint, new_stats in new["results"].items():
+        old_stats = old["results"].get(endpoint)
+        if(old_stats is None):
+            print(f"{endpoint:>24}: new endpoint")
+            continue
+        changes = []
+        for metric in METRICS:
+            before, after = old_stats[metric], new_stats[metric]
+            change = (after - before) / before if before else 0
+            regressed = after > before if metric == "queries" else change > threshold #any extra query is a regression
+            changes.append(f"{metric} {before} -> {after} ({change:+.0%}){' !' if regressed else ''}")
+            if(regressed):
+                regressions.append((endpoint, metric))
+        print(f"{endpoint:>24}: " + ", ".join(changes))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare benchmark results of two runs.")
+    parser.add_argument("old", help="Baseline results (JSON).")
+    parser.add_argument("new", help="New results (JSON).")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative latency increase.")
+    args = parser.parse_args()
+    with open(args.old) as old_file, open(args.new) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    for key in ["genomes", "tracks_per_genome", "sources_per_track"]:
+        if(old["meta"][key] != new["meta"][key]):
+            print(f"Warning: different {key} ({old['meta'][key]} vs {new['meta'][key]})")
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    if(compare(old, new, args.threshold)):
+        sys.exit(1)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import statistics
+import subprocess
+import time
+import requests
+from async_workers import BASE_DIR, pick_urls, wait_for_port
+
+"""
+Compare latency of the track endpoint with a new database connection per
+request (DATABASE_CONN_MAX_AGE=0) and with persistent connections, served by
+gunicorn sync workers. Requests are sent one at a time, so the difference is
+the connection setup time.
+Run from the repo root, with the database settings (DATABASE_* env variables)
+pointing to a loaded database:
+  python benchmarks/connections.py --requests 2000
+"""
+
+def benchmark(conn_max_age, args, urls):
+    env = {**os.environ, "DATABASE_CONN_MAX_AGE": str(conn_max_age), "TRACK_CACHE_BACKEND": ""}
+    command = ["gunicorn", "--workers", "1", "--bind", f"127.0.0.1:{args.port}", "ensembl_track_api.wsgi:application"]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        session = requests.Session()
+        latencies = []
+        for i in range(args.requests + len(urls)):
+            start = time.perf_counter()
+            response = session.get(urls[i % len(urls)])
+            if(i >= len(urls)): #first round is warm-up
+                latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    print(f"CONN_MAX_AGE={conn_max_age:<4}: median {statistics.median(latencies) * 1000:6.2f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f} ms, {len(latencies) / sum(latencies):7.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare track endpoint latency with and without persistent database connections.")
+    parser.add_argument("--requests", type=int, default=2000, help="Nr of requests per run.")
+    parser.add_argument("--genomes", type=int, default=10, help="Nr of genomes to request tracks from.")
+    parser.add_argument("--conn-max-age", type=int, nargs="+", default=[0, 60], help="DATABASE_CONN_MAX_AGE values to compare.")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    urls = [url for url in pick_urls(f"http://127.0.0.1:{args.port}", args.genomes) if "/track/" in url]
+    print(f"{len(urls)} track urls, {args.requests} requests")
+    for conn_max_age in args.conn_max_age:
+        benchmark(conn_max_age, args, urls)
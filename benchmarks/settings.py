@@ -0,0 +1,21 @@
+import os
+import time
+from django.db.backends.signals import connection_created
+from ensembl_track_api.settings import *
+
+"""
+Django settings for benchmark servers: project settings plus a simulated
+database latency (BENCHMARK_DB_LATENCY seconds added to every SQL query).
+"""
+
+BENCHMARK_DB_LATENCY = float(os.getenv("BENCHMARK_DB_LATENCY", 0))
+
+def slow_query(execute, sql, params, many, context):
+    time.sleep(BENCHMARK_DB_LATENCY)
+    return execute(sql, params, many, context)
+
+def add_db_latency(sender, connection, **kwargs):
+    if(BENCHMARK_DB_LATENCY and slow_query not in connection.execute_wrappers):
+        connection.execute_wrappers.append(slow_query)
+
+connection_created.connect(add_db_latency)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+"""
+Compare per-request overhead and process memory of the read endpoints under
+different settings modules (default: full project settings vs the read-only
+profile). Each profile runs in its own process, serving requests in-process
+through the WSGI handler, with the local payload cache enabled so the numbers
+reflect framework overhead rather than database time.
+Run from the repo root, with the database settings (DATABASE_* env variables)
+pointing to a loaded database:
+  python benchmarks/settings_profiles.py --requests 2000
+"""
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ["ensembl_track_api.settings", "ensembl_track_api.settings_readonly"]
+
+def measure(n_requests, n_genomes):
+    """
+    Time requests to track_categories and track endpoints (run in a subprocess with the profile settings).
+    """
+    sys.path.insert(0, BASE_DIR)
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+    from tracks.models import Track
+    genome_ids = list(Track.objects.order_by("genome_id").values_list("genome_id", flat=True).distinct()[:n_genomes])
+    if(not genome_ids):
+        sys.exit("No tracks in the database.")
+    track_ids = Track.objects.filter(genome_id__in=genome_ids).values_list("track_id", flat=True)
+    endpoints = {
+        "track_categories": [reverse("tracks:genome_tracks_url", args=[genome_id]) for genome_id in genome_ids],
+        "track": [reverse("tracks:track_url", args=[track_id]) for track_id in track_ids],
+    }
+    client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+    results = {}
+    for endpoint, urls in endpoints.items():
+        for url in urls: #warm-up (fills the payload cache)
+            assert client.get(url).status_code == 200
+        latencies = []
+        for i in range(n_requests):
+            start = time.perf_counter()
+            client.get(urls[i % len(urls)])
+            latencies.append(time.perf_counter() - start)
+        results[endpoint] = {"median_us": round(statistics.median(latencies) * 1e6, 1),
+            "mean_us": round(statistics.mean(latencies) * 1e6, 1)}
+    results["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    results["modules"] = len(sys.modules)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare request overhead and memory of settings profiles.")
+    parser.add_argument("--requests", type=int, default=2000, help="Nr of requests per endpoint.")
+    parser.add_argument("--genomes", type=int, default=10, help="Nr of genomes to request.")
+    parser.add_argument("--profiles", nargs="+", default=PROFILES, help="Settings modules to compare.")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS) #subprocess mode
+    args = parser.parse_args()
+    if(args.measure):
+        measure(args.requests, args.genomes)
+        sys.exit()
+    for profile in args.profiles:
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": profile, "TRACK_CACHE_BACKEND": "local"}
+        output = subprocess.run([sys.executable, __file__, "--measure", "--requests", str(args.requests), "--genomes", str(args.genomes)],
+            env=env, cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout
+        results = json.loads(output)
+        print(f"{profile}: " + ", ".join(f"{endpoint} {results[endpoint]['median_us']} us" for endpoint in ["track_categories", "track"])
+            + f", max RSS {results['max_rss_mb']} MB, {results['modules']} modules")
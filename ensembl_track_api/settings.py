@@ -13,6 +13,10 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 import os
 from pathlib import Path
 
+def env_flag(name, default=""):
+    # boolean setting from environment ("", "0", "false", "no": False)
+    return os.getenv(name, default).strip().lower() not in ("", "0", "false", "no")
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "tracks.compression.compression_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -54,6 +59,11 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Request timing/SQL instrumentation (Server-Timing header and /metrics endpoint, see tracks/instrumentation.py)
+INSTRUMENTATION = env_flag("INSTRUMENTATION")
+if(INSTRUMENTATION):
+    MIDDLEWARE.insert(0, "tracks.instrumentation.instrumentation_middleware")
+
 ROOT_URLCONF = "ensembl_track_api.urls"
 
 TEMPLATES = [
@@ -78,10 +88,40 @@ WSGI_APPLICATION = "ensembl_track_api.wsgi.application"
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # orjson renderer (same output as rest_framework.renderers.JSONRenderer, which it falls back to without orjson)
+        os.getenv("JSON_RENDERER", "tracks.renderers.FastJSONRenderer"),
     ]
 }
 
+# Cache settings
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", ""),
+    }
+}
+
+# Rendered track_categories payload cache (see tracks/cache.py)
+TRACK_CACHE_BACKEND = os.getenv("TRACK_CACHE_BACKEND", "") # "local", "shared" or "" (disabled)
+TRACK_CACHE_ALIAS = os.getenv("TRACK_CACHE_ALIAS", "default") # CACHES entry used by the shared backend
+TRACK_CACHE_SIZE = int(os.getenv("TRACK_CACHE_SIZE", 1000)) # max nr of genomes in the local backend
+TRACK_CACHE_TIMEOUT = int(os.getenv("TRACK_CACHE_TIMEOUT", 300)) # entry lifetime in seconds (0: no expiry, shared backend only)
+
+# How track_categories payload is built: "orm" (in Python) or "postgres" (single SQL statement, see tracks/aggregation.py)
+TRACK_CATEGORIES_ENGINE = os.getenv("TRACK_CATEGORIES_ENGINE", "orm")
+
+# Serve read endpoints with async views (only when running under an ASGI server, e.g. uvicorn workers)
+ASYNC_VIEWS = env_flag("ASYNC_VIEWS")
+
+# Response compression (see tracks/compression.py)
+COMPRESSION_ENCODINGS = [encoding for encoding in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",") if encoding] # in order of preference ("" to disable)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024)) # don't compress smaller responses (bytes)
+
+# Cache-Control header for track/track_categories responses (sent with ETag header; "" to omit)
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "no-cache")
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
@@ -91,6 +131,17 @@ DATABASE_HOST = os.getenv("DATABASE_HOST", "db")
 DATABASE_PORT = os.getenv("DATABASE_PORT", 5432)
 DATABASE_USER = os.getenv("DATABASE_USER", "postgres")
 DATABASE_PASS = os.getenv("DATABASE_PASS", "postgres")
+DATABASE_CONN_MAX_AGE = int(os.getenv("DATABASE_CONN_MAX_AGE", 60)) # seconds a connection is reused between requests (0: new connection per request)
+if(ASYNC_VIEWS): # connections opened by async views (in sync_to_async threads) are not reliably closed at the end of the request
+    DATABASE_CONN_MAX_AGE = 0
+DATABASE_CONN_HEALTH_CHECKS = env_flag("DATABASE_CONN_HEALTH_CHECKS", "1") # check persistent connections before reuse
+# Connecting through a transaction pooler (e.g. PgBouncer in transaction mode): no server-side cursors
+DATABASE_POOLER = env_flag("DATABASE_POOLER")
+# Read replicas (see tracks/routers.py): comma-separated "host" or "host:port" list (same database name and credentials)
+DATABASE_REPLICAS = [replica for replica in os.getenv("DATABASE_REPLICAS", "").split(",") if replica]
+DATABASE_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DATABASE_REPLICA_CONNECT_TIMEOUT", 2)) # seconds before reads fall back from an unreachable replica
+DATABASE_REPLICA_RETRY = int(os.getenv("DATABASE_REPLICA_RETRY", 30)) # seconds an unreachable replica is skipped
+DATABASE_REPLICA_PIN = int(os.getenv("DATABASE_REPLICA_PIN", 10)) # seconds a client reads from the primary after a write (0: only in the same request)
 
 DATABASES = {
     "default": {
@@ -100,9 +151,26 @@ DATABASES = {
         "PASSWORD": DATABASE_PASS,
         "HOST": DATABASE_HOST,
         "PORT": DATABASE_PORT,
+        "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": DATABASE_CONN_HEALTH_CHECKS,
+        "DISABLE_SERVER_SIDE_CURSORS": DATABASE_POOLER,
     }
 }
 
+for i, replica in enumerate(DATABASE_REPLICAS, 1):
+    replica_host, _, replica_port = replica.partition(":")
+    DATABASES[f"replica_{i}"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASE_PORT,
+        "OPTIONS": {"connect_timeout": DATABASE_REPLICA_CONNECT_TIMEOUT},
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICA_ALIASES = [alias for alias in DATABASES if alias != "default"]
+if(DATABASE_REPLICA_ALIASES):
+    DATABASE_ROUTERS = ["tracks.routers.ReplicaRouter"]
+    MIDDLEWARE.insert(0, "tracks.routers.replica_middleware")
+
 # Datamodels
 DEFAULT_AUTO_FIELD='django.db.models.AutoField'
 
@@ -0,0 +1,32 @@
+from ensembl_track_api.settings import *
+
+"""
+Lean settings profile for read-only API deployments (ALLOWED_METHODS=get):
+project settings without the apps and middleware the API doesn't use (sessions,
+auth, messages, CSRF, clickjacking) and without DRF authentication/permission
+checks (all requests are anonymous). Use with DJANGO_SETTINGS_MODULE=ensembl_track_api.settings_readonly
+"""
+
+INSTALLED_APPS = [
+    "rest_framework",
+    "tracks",
+]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware in [
+    "tracks.instrumentation.instrumentation_middleware",
+    "tracks.routers.replica_middleware",
+    "django.middleware.security.SecurityMiddleware",
+    "tracks.compression.compression_middleware",
+    "django.middleware.common.CommonMiddleware",
+]]
+
+TEMPLATES = [{**TEMPLATES[0], "OPTIONS": {"context_processors": []}}]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_AUTHENTICATION_CLASSES": [],
+    "DEFAULT_PERMISSION_CLASSES": [],
+    "UNAUTHENTICATED_USER": None, #request.user is None (AnonymousUser needs django.contrib.auth)
+}
+
+AUTH_PASSWORD_VALIDATORS = []
@@ -0,0 +1,52 @@
+from django.db import connections, router
+from .models import Category, GenomeRelease, Track, Source
+
+"""
+Postgres engine for track_categories payload: the whole JSON document is built
+in a single SQL statement (json_build_object/json_agg), along with the track
+count and last modification time for the ETag. Same content and ordering as the
+payload built from ORM rows (categories in order of their first track, tracks
+and sources in model order), but with Postgres JSON text formatting.
+"""
+
+TRACK_CATEGORIES_SQL = f"""
+WITH track_payloads AS (
+    SELECT t.id, t.category_id, t.display_order, t.updated, json_build_object(
+        'track_id', t.track_id, 'label', t.label, 'colour', t.colour, 'trigger', t.trigger, 'type', t.type,
+        'display_order', t.display_order, 'on_by_default', t.on_by_default, 'additional_info', t.additional_info,
+        'sources', COALESCE((
+            SELECT json_agg(json_build_object('name', s.name, 'url', s.url) ORDER BY s.id)
+            FROM {Source.track.through._meta.db_table} st JOIN {Source._meta.db_table} s ON s.id = st.source_id
+            WHERE st.track_id = t.id
+        ), '[]'),
+        'description', t.description
+    ) AS payload
+    FROM {Track._meta.db_table} t
+    WHERE t.genome_id = %(genome_id)s AND t.release_id = COALESCE(%(release_id)s,
+        (SELECT release_id FROM {GenomeRelease._meta.db_table} WHERE genome_id = %(genome_id)s))
+), category_payloads AS (
+    -- first track of the category in (display_order, id) order
+    SELECT MIN(tp.display_order) AS display_order, (array_agg(tp.id ORDER BY tp.display_order, tp.id))[1] AS first_id, COUNT(*) AS track_count,
+        MAX(tp.updated) AS updated, json_build_object(
+            'label', c.label, 'track_category_id', c.track_category_id, 'type', c.type,
+            'track_list', json_agg(tp.payload ORDER BY tp.display_order, tp.id)
+        ) AS payload
+    FROM track_payloads tp JOIN {Category._meta.db_table} c ON c.id = tp.category_id
+    GROUP BY c.id
+)
+SELECT json_build_object('track_categories', json_agg(payload ORDER BY display_order, first_id))::text,
+    SUM(track_count)::int, MAX(updated)
+FROM category_payloads
+"""
+
+def get_track_categories(genome_id, release_id=None):
+    """
+    Returns (rendered payload, track count, last updated) for a genome in a release (default: active release),
+    or None if the genome has no tracks.
+    """
+    with connections[router.db_for_read(Track)].cursor() as cursor: #raw SQL: same database as ORM reads (see routers.py)
+        cursor.execute(TRACK_CATEGORIES_SQL, {"genome_id": str(genome_id), "release_id": release_id})
+        body, track_count, last_updated = cursor.fetchone()
+    if(not track_count):
+        return None
+    return body.encode(), track_count, last_updated
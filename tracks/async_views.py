@@ -0,0 +1,76 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from tracks.models import Track
+from tracks.views import TrackList
+from tracks import cache, compression, etags, payloads
+from tracks.renderers import render_json
+import uuid
+
+"""
+Async variants of the read endpoints (GET requests), using Django async ORM.
+Enabled with ASYNC_VIEWS setting when served by an ASGI server (see urls.py).
+Same responses as the corresponding (sync) DRF views in views.py.
+"""
+
+def json_response(data, status=200):
+    return HttpResponse(render_json(data), status=status, content_type="application/json")
+
+def with_sync_view(async_get, sync_view):
+    """
+    Serve GET requests with an async view and other requests (or GET requests the async view
+    does not handle, i.e. returns None) with a sync DRF view.
+    """
+    @sync_to_async
+    def call_sync_view(request, *args, **kwargs):
+        response = sync_view(request, *args, **kwargs)
+        return response.render() if hasattr(response, "render") else response #DRF response is rendered in the same thread
+
+    async def view(request, *args, **kwargs):
+        if(request.method == "GET"):
+            response = await async_get(request, *args, **kwargs)
+            if(response is not None):
+                return response
+        return await call_sync_view(request, *args, **kwargs)
+    view.csrf_exempt = True #as DRF views (csrf_exempt decorator would hide the coroutine function from Django)
+    return view
+
+async def genome_track_list(request, genome_id):
+    payload, version = await cache.aget_payload(genome_id)
+    if(payload is None):
+        payload = await payloads.aget_stored_payload(genome_id)
+        if(payload is None):
+            if(etags.is_conditional(request)):
+                etag = await etags.aquery_genome_etag(genome_id)
+                if(etag and etags.etag_matches(request, etag)):
+                    return etags.not_modified(etag)
+            payload = await payloads.agenome_payload(genome_id)
+            if(payload is None):
+                return json_response({"error": "No tracks found for this genome."}, status=404)
+        payload = await cache.aset_payload(genome_id, payload, version)
+    if(etags.etag_matches(request, payload.etag)):
+        return etags.not_modified(payload.etag)
+    response = etags.add_cache_headers(HttpResponse(payload.body, content_type="application/json"), payload.etag)
+    return compression.payload_response(request, response, payload)
+
+async def track_object(request, track_id):
+    if(etags.is_conditional(request)):
+        etag = await etags.aquery_track_etag(track_id)
+        if(etag and etags.etag_matches(request, etag)):
+            return etags.not_modified(etag)
+    rows = await payloads.aget_track_rows(Track.objects.filter(track_id=track_id), payloads.READ_TRACK_FIELDS)
+    if(not rows):
+        return json_response({"error": "No track found with this track id."}, status=404)
+    return etags.add_cache_headers(json_response(payloads.track_payload(rows[0])), etags.track_etag(track_id, rows[0]["updated"]))
+
+async def track_list(request):
+    if("track_ids" not in request.GET): #full track records for a genome: served by sync view
+        return None
+    try:
+        track_ids = [str(uuid.UUID(track_id.strip())) for track_id in request.GET["track_ids"].split(",")]
+    except ValueError:
+        return json_response({"error": "Invalid track id in track_ids parameter."}, status=400)
+    if(len(track_ids) > TrackList.max_tracks):
+        return json_response({"error": f"Expected up to {TrackList.max_tracks} track ids."}, status=400)
+    rows = await payloads.aget_track_rows(Track.objects.filter(track_id__in=track_ids), payloads.READ_TRACK_FIELDS)
+    tracks = {row["track_id"]: payloads.track_payload(row) for row in rows}
+    return json_response({"tracks": [tracks.get(track_id, {"track_id": track_id, "error": "No track found with this track id."}) for track_id in track_ids]})
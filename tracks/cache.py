@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from functools import partial
+from threading import Lock
+import time
+import uuid
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from .compression import compress_payload
+
+"""
+Cache for rendered track_categories payloads, keyed by genome uuid.
+Backend is selected with TRACK_CACHE_BACKEND setting:
+- "local": in-process LRU cache (bounded by TRACK_CACHE_SIZE entries)
+- "shared": Django cache framework (TRACK_CACHE_ALIAS in CACHES setting)
+- "" (default): caching disabled
+Entries are invalidated on every write that touches a genome, by bumping the genome's
+version: readers fetch the version along with the entry and tag the payload they cache
+with it, so a payload rendered before a write can't be served after it. The local backend
+can only invalidate entries in the process that handled the write, so other
+processes rely on TRACK_CACHE_TIMEOUT (required with the local backend); use the
+shared backend when writes and reads are served by separate processes. Cached
+payloads hold their compressed variants (see compression.py).
+"""
+
+@dataclass(frozen=True)
+class Payload:
+    body: bytes
+    etag: str
+    encodings: dict = field(default_factory=dict) #content encoding => compressed body
+
+def compressed(payload):
+    return payload if payload.encodings else replace(payload, encodings=compress_payload(payload.body))
+
+class LocalCache:
+    def __init__(self, max_size, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict() #key => (value, version, expiry time)
+        self.versions = {} #key => nr of invalidations
+        self.lock = Lock()
+
+    def get(self, key):
+        """
+        Cached value (None if missing) and the current version of the key.
+        """
+        with self.lock:
+            version = self.versions.get(key, 0)
+            entry = self.entries.get(key)
+            if(entry is None):
+                return None, version
+            value, entry_version, expires = entry
+            if(entry_version != version or (expires is not None and expires < time.monotonic())):
+                del self.entries[key]
+                return None, version
+            self.entries.move_to_end(key)
+            return value, version
+
+    def set(self, key, value, version):
+        expires = time.monotonic() + self.timeout if self.timeout else None
+        with self.lock:
+            if(version != self.versions.get(key, 0)): #invalidated since the value was read
+                return
+            self.entries[key] = (value, version, expires)
+            self.entries.move_to_end(key)
+            while(len(self.entries) > self.max_size):
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.entries.pop(key, None)
+
+    async def aget(self, key):
+        return self.get(key) #in-memory, no need to leave the event loop
+
+    async def aset(self, key, value, version):
+        self.set(key, value, version)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class SharedCache:
+    key_prefix = "track_categories:v3:"
+    version_prefix = "track_categories:version:"
+
+    def __init__(self, alias, timeout=None):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def entry_value(self, key, entries, version):
+        entry = entries.get(self.key_prefix + key)
+        return entry[1] if entry is not None and entry[0] == version else None
+
+    def get(self, key):
+        entries = self.cache.get_many([self.key_prefix + key, self.version_prefix + key])
+        version = entries.get(self.version_prefix + key)
+        if(version is None):
+            self.cache.add(self.version_prefix + key, uuid.uuid4().hex, None)
+            version = self.cache.get(self.version_prefix + key)
+        return self.entry_value(key, entries, version), version
+
+    def set(self, key, value, version):
+        self.cache.set(self.key_prefix + key, (version, value), self.timeout)
+
+    def invalidate(self, key):
+        # random tokens rather than counters: an evicted version key can't bring back old entries
+        self.cache.set(self.version_prefix + key, uuid.uuid4().hex, None)
+        self.cache.delete(self.key_prefix + key)
+
+    async def aget(self, key):
+        entries = await self.cache.aget_many([self.key_prefix + key, self.version_prefix + key])
+        version = entries.get(self.version_prefix + key)
+        if(version is None):
+            await self.cache.aadd(self.version_prefix + key, uuid.uuid4().hex, None)
+            version = await self.cache.aget(self.version_prefix + key)
+        return self.entry_value(key, entries, version), version
+
+    async def aset(self, key, value, version):
+        await self.cache.aset(self.key_prefix + key, (version, value), self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if(_backend is None):
+        timeout = settings.TRACK_CACHE_TIMEOUT or None
+        if(settings.TRACK_CACHE_BACKEND == "local"):
+            if(timeout is None): #entries invalidated by writes in other processes would never expire
+                raise ImproperlyConfigured("TRACK_CACHE_TIMEOUT must be set for the local track cache backend.")
+            _backend = LocalCache(settings.TRACK_CACHE_SIZE, timeout)
+        elif(settings.TRACK_CACHE_BACKEND == "shared"):
+            _backend = SharedCache(settings.TRACK_CACHE_ALIAS, timeout)
+        else:
+            _backend = False
+    return _backend
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if(setting.startswith("TRACK_CACHE") or setting == "CACHES"):
+        _backend = None
+
+def get_payload(genome_id):
+    """
+    Cached payload (None if missing) and the cache version to pass to set_payload.
+    """
+    backend = get_backend()
+    return backend.get(str(genome_id)) if backend else (None, None)
+
+def set_payload(genome_id, payload, version):
+    """
+    Cache a payload (with its compressed variants) read from the database after get_payload returned the version.
+    Returns the payload as cached.
+    """
+    backend = get_backend()
+    if(backend):
+        payload = compressed(payload)
+        backend.set(str(genome_id), payload, version)
+    return payload
+
+async def aget_payload(genome_id):
+    backend = get_backend()
+    return await backend.aget(str(genome_id)) if backend else (None, None)
+
+async def aset_payload(genome_id, payload, version):
+    backend = get_backend()
+    if(backend):
+        payload = await sync_to_async(compressed, thread_sensitive=False)(payload) #off the event loop
+        await backend.aset(str(genome_id), payload, version)
+    return payload
+
+def invalidate(genome_id):
+    """
+    Bump the cache version of a genome once the current transaction (if any) is committed.
+    """
+    backend = get_backend()
+    if(backend):
+        transaction.on_commit(partial(backend.invalidate, str(genome_id)))
@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+from .instrumentation import timer
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+"""
+Response compression (Content-Encoding: br or gzip) for JSON responses larger than
+COMPRESSION_MIN_SIZE bytes, negotiated with Accept-Encoding request header.
+Encodings are listed in COMPRESSION_ENCODINGS setting in order of preference
+("br" needs brotli package; "" disables compression).
+Rendered track_categories payloads are compressed once (stored and cached with
+their compressed variants, see payloads.py) at a higher compression level;
+other responses are compressed by the middleware on every request.
+Under ASGI, compression runs in a worker thread so it doesn't block the event loop.
+"""
+
+LEVELS = {
+    # (per request, precompressed)
+    "br": (5, 9),
+    "gzip": (6, 9),
+}
+
+def available_encodings():
+    return [encoding for encoding in settings.COMPRESSION_ENCODINGS if encoding == "gzip" or (encoding == "br" and brotli)]
+
+def compress(body, encoding, precompressed=False):
+    level = LEVELS[encoding][precompressed]
+    with timer("serialize_time"):
+        if(encoding == "br"):
+            return brotli.compress(body, mode=brotli.MODE_TEXT, quality=level)
+        return gzip.compress(body, compresslevel=level, mtime=0)
+
+def compress_payload(body):
+    """
+    Compressed variants of a rendered payload (encoding => bytes), empty for small payloads.
+    """
+    if(len(body) < settings.COMPRESSION_MIN_SIZE):
+        return {}
+    return {encoding: compress(body, encoding, precompressed=True) for encoding in available_encodings()}
+
+def accepted_encoding(request, encodings):
+    """
+    Most preferred of the given encodings accepted by the client (Accept-Encoding header), or None for identity.
+    """
+    weights = {}
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for param in params:
+            if(param.startswith("q=")):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0
+        if(name):
+            weights[name.lower()] = weight
+    best, best_weight = None, 0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0))
+        if(weight > best_weight):
+            best, best_weight = encoding, weight
+    return best
+
+def encode_response(response, encoding, body):
+    """
+    Set the (compressed) body of a response and its headers.
+    """
+    response.content = body
+    response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(body))
+    if(response.has_header("ETag") and not response["ETag"].startswith("W/")):
+        response["ETag"] = "W/" + response["ETag"] #same as Django GZipMiddleware (weak ETag for a different representation)
+    return response
+
+def payload_response(request, response, payload):
+    """
+    Use a compressed variant of a rendered payload (if any and accepted by the client) as response content.
+    """
+    patch_vary_headers(response, ["Accept-Encoding"])
+    encoding = accepted_encoding(request, [encoding for encoding in available_encodings() if encoding in payload.encodings])
+    return encode_response(response, encoding, payload.encodings[encoding]) if encoding else response
+
+async def acompress(body, encoding):
+    return await sync_to_async(compress, thread_sensitive=False)(body, encoding) #CPU bound, no need for the thread running the sync views
+
+def response_encoding(request, response):
+    """
+    Encoding to compress a response with (None to send it as is).
+    """
+    if(response.streaming or response.has_header("Content-Encoding") or response.status_code != 200
+       or not response.get("Content-Type", "").startswith("application/json")):
+        return None
+    patch_vary_headers(response, ["Accept-Encoding"])
+    if(len(response.content) < settings.COMPRESSION_MIN_SIZE):
+        return None
+    return accepted_encoding(request, available_encodings())
+
+@sync_and_async_middleware
+def compression_middleware(get_response):
+    if(asyncio.iscoroutinefunction(get_response)):
+        async def middleware(request):
+            response = await get_response(request)
+            encoding = response_encoding(request, response)
+            return encode_response(response, encoding, await acompress(response.content, encoding)) if encoding else response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            encoding = response_encoding(request, response)
+            return encode_response(response, encoding, compress(response.content, encoding)) if encoding else response
+    return middleware
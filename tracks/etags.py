@@ -0,0 +1,73 @@
+from hashlib import md5
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from .models import Track
+from . import compression, releases
+
+"""
+Conditional request (ETag / If-None-Match) support for Track API responses.
+ETags are derived from the content version of the tracks in the response:
+nr of tracks and their last modification time (Track.updated field).
+With compression enabled, the ETag is weak (the same for all content encodings,
+and in 304 responses) and responses vary by Accept-Encoding.
+"""
+
+def make_etag(*parts):
+    return quote_etag(md5(":".join(str(part) for part in parts).encode()).hexdigest())
+
+def genome_etag(genome_id, track_count, last_updated):
+    return make_etag("genome", genome_id, track_count, last_updated.isoformat())
+
+def track_etag(track_id, last_updated):
+    return make_etag("track", track_id, last_updated.isoformat())
+
+def tracks_etag(genome_id, rows):
+    """
+    ETag for a list of track rows (see payloads.get_track_rows) already fetched from db.
+    """
+    return genome_etag(genome_id, len(rows), max(row["updated"] for row in rows))
+
+def version_etag(genome_id, version):
+    return genome_etag(genome_id, version["count"], version["last_updated"]) if version["count"] else None
+
+def query_genome_etag(genome_id):
+    """
+    ETag for all tracks of a genome in its active release (single aggregate query), or None if the genome has no tracks.
+    """
+    return version_etag(genome_id, releases.genome_tracks(genome_id).aggregate(count=Count("id"), last_updated=Max("updated")))
+
+async def aquery_genome_etag(genome_id):
+    return version_etag(genome_id, await releases.genome_tracks(genome_id).aaggregate(count=Count("id"), last_updated=Max("updated")))
+
+def query_track_etag(track_id):
+    """
+    ETag for a single track, or None if the track does not exist.
+    """
+    last_updated = Track.objects.filter(track_id=track_id).values_list("updated", flat=True).first()
+    return track_etag(track_id, last_updated) if last_updated else None
+
+async def aquery_track_etag(track_id):
+    last_updated = await Track.objects.filter(track_id=track_id).values_list("updated", flat=True).afirst()
+    return track_etag(track_id, last_updated) if last_updated else None
+
+def is_conditional(request):
+    return "HTTP_IF_NONE_MATCH" in request.META
+
+def etag_matches(request, etag):
+    etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    return "*" in etags or etag in etags or f"W/{etag}" in etags
+
+def not_modified(etag):
+    return add_cache_headers(HttpResponseNotModified(), etag)
+
+def add_cache_headers(response, etag):
+    if(compression.available_encodings()):
+        patch_vary_headers(response, ["Accept-Encoding"])
+        etag = etag if etag.startswith("W/") else f"W/{etag}"
+    response["ETag"] = etag
+    if(settings.CACHE_CONTROL):
+        response["Cache-Control"] = settings.CACHE_CONTROL
+    return response
@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from time import perf_counter
+import asyncio
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+"""
+Request instrumentation (enabled with INSTRUMENTATION setting): wall time, nr of
+SQL queries, SQL time, serialization time (JSON rendering and payload grouping)
+and response size of every request. Sent in Server-Timing response header and
+aggregated per endpoint in histograms, exported in Prometheus text format by the
+metrics view. Histograms are kept per process (i.e. per server worker).
+When disabled, the middleware is not installed and timer() is a no-op.
+"""
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0
+    serialize_time: float = 0
+
+current_stats = ContextVar("current_stats", default=None)
+
+@contextmanager
+def timer(stat):
+    """
+    Add the time spent in the block to a stat of the current request (if instrumented).
+    """
+    stats = current_stats.get()
+    if(stats is None):
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, stat, getattr(stats, stat) + perf_counter() - start)
+
+def query_wrapper(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if(stats is None):
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += perf_counter() - start
+
+def add_query_wrapper(connection, **kwargs):
+    if(query_wrapper not in connection.execute_wrappers):
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {} #labels => [bucket counts..., sum, count]
+        self.lock = Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.setdefault(labels, [0] * len(self.buckets) + [0, 0])
+            series[bisect_left(self.buckets, value)] += 1 #non-cumulative bucket count ("+Inf" bucket is last)
+            series[-2] += value
+            series[-1] += 1
+
+    def export(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: values[:] for labels, values in self.series.items()}
+        for (endpoint, method), values in sorted(series.items()):
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            total = 0
+            for bucket, count in zip(self.buckets + ["+Inf"], values):
+                total += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bucket}"}} {total}')
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {values[-1]}")
+        return lines
+
+TIME_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+histograms = {
+    "duration": Histogram("track_api_request_duration_seconds", "Request wall time.", TIME_BUCKETS),
+    "queries": Histogram("track_api_db_queries", "SQL queries per request.", [0, 1, 2, 3, 5, 10, 25, 50, 100]),
+    "db_time": Histogram("track_api_db_duration_seconds", "Total SQL time per request.", TIME_BUCKETS),
+    "serialize_time": Histogram("track_api_serialization_duration_seconds", "Serialization time per request.", TIME_BUCKETS),
+    "size": Histogram("track_api_response_size_bytes", "Response body size.", [100, 1000, 10000, 100000, 1000000, 10000000]),
+}
+
+def record(request, response, stats, start):
+    duration = perf_counter() - start
+    match = request.resolver_match
+    labels = (match.view_name if match else "unmatched", request.method)
+    size = len(response.content) if not response.streaming else 0
+    for name, value in [("duration", duration), ("queries", stats.queries), ("db_time", stats.db_time),
+                        ("serialize_time", stats.serialize_time), ("size", size)]:
+        histograms[name].observe(labels, value)
+    response["Server-Timing"] = (
+        f'total;dur={duration * 1000:.2f}, db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+        f"serialize;dur={stats.serialize_time * 1000:.2f}"
+    )
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    connection_created.connect(add_query_wrapper) #connections opened in other threads (e.g. async ORM)
+
+    if(asyncio.iscoroutinefunction(get_response)):
+        async def middleware(request):
+            stats = RequestStats()
+            token = current_stats.set(stats)
+            start = perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                current_stats.reset(token)
+            record(request, response, stats, start)
+            return response
+    else:
+        def middleware(request):
+            for connection in connections.all():
+                add_query_wrapper(connection)
+            stats = RequestStats()
+            token = current_stats.set(stats)
+            start = perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                current_stats.reset(token)
+            record(request, response, stats, start)
+            return response
+    return middleware
+
+def metrics(request):
+    """
+    Request metrics in Prometheus text format.
+    """
+    if(not settings.INSTRUMENTATION):
+        raise Http404()
+    lines = [line for histogram in histograms.values() for line in histogram.export()]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4")
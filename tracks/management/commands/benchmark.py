@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import platform
+import statistics
+import subprocess
+import time
+import uuid
+import yaml
+import django
+from django.conf import settings as django_settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+from ensembl_track_api import settings
+from tracks.models import GenomePayload, Track
+from tracks.serializers import WriteTrackSerializer
+
+"""
+Benchmark of the Track API hot paths (requests handled in-process by Django test client).
+Creates a throwaway test database, seeds it with synthetic tracks generated from
+track templates (N genomes x M tracks x K sources) and reports latency percentiles,
+SQL queries per request and throughput of each endpoint as JSON (see benchmarks/compare.py
+for comparing results between commits).
+"""
+
+def template_payloads(genome_id, n_tracks, n_sources):
+    """
+    Track payloads for a genome: track templates (cycled, with unique labels) with n_sources sources per track.
+    """
+    template_paths = sorted((Path(django_settings.BASE_DIR) / "templates").glob("*.yaml"))
+    templates = [yaml.safe_load(path.read_text()) for path in template_paths]
+    payloads = []
+    for i in range(n_tracks):
+        track_data = dict(templates[i % len(templates)], genome_id=str(genome_id))
+        if(i >= len(templates)):
+            track_data["label"] = f"{track_data['label'][:40]} ({i // len(templates)})"
+        track_data["sources"] = [{"name": f"Source {(i + k) % (n_sources * 2)}", "url": f"https://source{(i + k) % (n_sources * 2)}.org"}
+            for k in range(n_sources)]
+        payloads.append(track_data)
+    return payloads
+
+def submit(payloads):
+    serializers = [WriteTrackSerializer(data=track_data) for track_data in payloads]
+    for serializer in serializers:
+        serializer.is_valid(raise_exception=True)
+    WriteTrackSerializer(many=True).create([serializer.validated_data for serializer in serializers])
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+class Command(BaseCommand):
+    help = "Benchmark Track API endpoints against a seeded throwaway database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--genomes", type=int, default=100, help="Nr of seeded genomes.")
+        parser.add_argument("--tracks", type=int, default=40, help="Nr of tracks per genome.")
+        parser.add_argument("--sources", type=int, default=2, help="Nr of sources per track.")
+        parser.add_argument("--iterations", type=int, default=50, help="Requests per endpoint.")
+        parser.add_argument("--output", default="", help="Write JSON results to this file (default: stdout).")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_db_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        allowed_methods = settings.ALLOWED_METHODS[:]
+        settings.ALLOWED_METHODS[:] = ["get", "post", "delete"] #views keep a reference to this list
+        try:
+            with override_settings(TRACK_CACHE_BACKEND=""): #measure the database path
+                results = self.run_benchmarks(options)
+        finally:
+            settings.ALLOWED_METHODS[:] = allowed_methods
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+        report = json.dumps(results, indent=2)
+        if(options["output"]):
+            Path(options["output"]).write_text(report + "\n")
+        else:
+            self.stdout.write(report)
+
+    def run_benchmarks(self, options):
+        n_genomes, n_tracks, n_sources, iterations = (options[key] for key in ["genomes", "tracks", "sources", "iterations"])
+        start = time.perf_counter()
+        genome_ids = [uuid.UUID(int=i + 1) for i in range(n_genomes)]
+        for genome_id in genome_ids:
+            submit(template_payloads(genome_id, n_tracks, n_sources))
+        self.stderr.write(f"Seeded {n_genomes} genomes x {n_tracks} tracks in {time.perf_counter() - start:.1f}s")
+        track_ids = list(Track.objects.filter(genome_id__in=genome_ids[:iterations]).values_list("track_id", flat=True))
+        client = Client()
+
+        def sample(values):
+            return (values[i % len(values)] for i in range(iterations))
+
+        def post(url, data):
+            return client.post(url, data, content_type="application/json")
+
+        @contextmanager
+        def without_stored_payloads():
+            stored = list(GenomePayload.objects.all())
+            GenomePayload.objects.all().delete()
+            yield
+            GenomePayload.objects.bulk_create(stored)
+
+        results = {}
+        results["track_categories"] = self.measure(
+            (reverse("tracks:genome_tracks_url", args=[genome_id]) for genome_id in sample(genome_ids)), client.get)
+        with without_stored_payloads():
+            results["track_categories_live"] = self.measure(
+                (reverse("tracks:genome_tracks_url", args=[genome_id]) for genome_id in sample(genome_ids)), client.get)
+        results["track"] = self.measure((reverse("tracks:track_url", args=[track_id]) for track_id in sample(track_ids)), client.get)
+        new_genome_ids = [uuid.uuid4() for i in range(iterations)]
+        results["track_post"] = self.measure(
+            ((reverse("tracks:track_url"), template_payloads(genome_id, 1, n_sources)[0]) for genome_id in new_genome_ids),
+            lambda args: post(*args), status=201)
+        results["tracks_bulk_post"] = self.measure(
+            ((reverse("tracks:tracks_url"), template_payloads(genome_id, n_tracks, n_sources)) for genome_id in new_genome_ids),
+            lambda args: post(*args), status=201)
+        results["genome_delete"] = self.measure(
+            (reverse("tracks:genome_tracks_url", args=[genome_id]) for genome_id in new_genome_ids), client.delete, status=204)
+        return {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": self.git_commit(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "genomes": n_genomes, "tracks_per_genome": n_tracks, "sources_per_track": n_sources, "iterations": iterations,
+                "track_categories_engine": django_settings.TRACK_CATEGORIES_ENGINE,
+            },
+            "results": results,
+        }
+
+    def measure(self, requests, send, status=200):
+        """
+        Send the requests one by one, returning latency percentiles (ms), mean SQL queries per request and throughput.
+        """
+        latencies = []
+        queries = []
+        for request in requests:
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = send(request)
+                latencies.append(time.perf_counter() - start)
+            if(response.status_code != status):
+                raise RuntimeError(f"Unexpected response ({response.status_code}): {response.content[:200]}")
+            queries.append(len(context.captured_queries))
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p90_ms": round(percentile(latencies, 0.9) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+            "queries": round(statistics.mean(queries), 2),
+            "requests_per_s": round(len(latencies) / sum(latencies), 1),
+        }
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                cwd=django_settings.BASE_DIR).stdout.strip() or None
+        except OSError:
+            return None
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from tracks import snapshots
+
+"""
+Export all tracks (with categories and sources) to a snapshot file, see tracks/snapshots.py.
+"""
+
+class Command(BaseCommand):
+    help = "Export all tracks, categories and sources to a snapshot file (gzipped if the filename ends with .gz)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Snapshot file path (- for stdout).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with snapshots.open_snapshot(options["path"], "wb") as file:
+            counts = snapshots.export_snapshot(file)
+        if(options["path"] != "-"):
+            rows = ", ".join(f"{count} {table}" for table, count in counts.items())
+            self.stdout.write(self.style.SUCCESS(f"Exported {rows} rows in {time.perf_counter() - start:.1f}s."))
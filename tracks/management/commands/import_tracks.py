@@ -0,0 +1,32 @@
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from tracks import cache, snapshots
+
+"""
+Replace all tracks (with categories and sources) with the contents of a snapshot file
+made by export_tracks command, then rebuild the stored track_categories payloads.
+"""
+
+class Command(BaseCommand):
+    help = "Replace all tracks, categories and sources with a snapshot file (gzipped if the filename ends with .gz)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Snapshot file path (- for stdin).")
+        parser.add_argument("--skip-payloads", action="store_true", help="Don't rebuild stored payloads (run rebuild_payloads later).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            with snapshots.open_snapshot(options["path"], "rb") as file:
+                counts = snapshots.import_snapshot(file)
+        except (snapshots.SnapshotError, OSError) as e:
+            raise CommandError(f"Import failed: {e}")
+        rows = ", ".join(f"{count} {table}" for table, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Imported {rows} rows in {time.perf_counter() - start:.1f}s."))
+        backend = cache.get_backend()
+        if(backend):
+            transaction.on_commit(backend.clear)
+        if(not options["skip_payloads"]):
+            call_command("rebuild_payloads", stdout=self.stdout)
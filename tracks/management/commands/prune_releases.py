@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from tracks.models import Release
+from tracks import releases
+
+"""
+Remove tracks of old releases (see releases.prune): tracks that are not in the active
+release of their genome are deleted in small batches, and releases no genome points
+to anymore are removed with their stored payloads. Chromosome sets that are no longer
+referenced by any track are removed at the end.
+"""
+
+class Command(BaseCommand):
+    help = "Delete tracks of releases that are no longer active (default: all releases that have been live)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Release names to prune (also releases still loading, e.g. an abandoned load).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Tracks deleted per transaction (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        if(options["names"]):
+            release_list = list(Release.objects.filter(name__in=options["names"]))
+            missing = set(options["names"]) - {release.name for release in release_list}
+            if(missing):
+                raise CommandError(f"Unknown releases: {', '.join(sorted(missing))}")
+        else:
+            release_list = list(Release.objects.filter(activated__isnull=False))
+        for release in release_list:
+            deleted = sum(releases.prune(release, options["batch_size"]))
+            removed = not Release.objects.filter(id=release.id).exists()
+            if(deleted or removed):
+                self.stdout.write(f"Release {release.name}: deleted {deleted} tracks{' (release removed)' if removed else ''}.")
+        chromosome_sets = releases.prune_chromosome_sets()
+        if(chromosome_sets):
+            self.stdout.write(f"Deleted {chromosome_sets} unused chromosome sets.")
+        self.stdout.write(self.style.SUCCESS(f"Pruned {len(release_list)} releases."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from tracks.models import GenomePayload, Track
+from tracks import payloads
+
+"""
+Rebuild stored track_categories payloads (GenomePayload table), e.g. after a migration,
+a change of payload settings or a manual fix to the tracks tables.
+"""
+
+class Command(BaseCommand):
+    help = "Rebuild stored track_categories payloads for all (or the given) genomes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("genome_ids", nargs="*", help="Genome uuids to rebuild (default: all genomes).")
+
+    def handle(self, *args, **options):
+        genome_ids = options["genome_ids"]
+        tracks = Track.objects.filter(genome_id__in=genome_ids) if genome_ids else Track.objects.all()
+        # payloads are stored per genome and release (incl. releases still loading)
+        genome_releases = list(tracks.order_by("genome_id", "release_id").values_list("genome_id", "release_id").distinct())
+        if(not genome_ids):
+            # payloads of genomes without tracks (in the release)
+            deleted, _ = GenomePayload.objects.exclude(
+                Exists(Track.objects.filter(genome_id=OuterRef("genome_id"), release_id=OuterRef("release_id")))
+            ).delete()
+            if(deleted):
+                self.stdout.write(f"Removed {deleted} stale payloads.")
+        for genome_id, release_id in genome_releases:
+            payloads.rebuild(genome_id, release_id) #one transaction per genome and release
+        genome_count = len({genome_id for genome_id, release_id in genome_releases})
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt payloads for {genome_count} genomes."))
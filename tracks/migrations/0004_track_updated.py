@@ -0,0 +1,18 @@
+# Generated by Django 4.1.11 on 2026-10-17 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0003_alter_source_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="updated",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.11 on 2026-10-17 10:15
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0004_track_updated"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="track",
+            name="unique_track",
+        ),
+        migrations.AddIndex(
+            model_name="track",
+            index=models.Index(fields=["genome_id", "display_order"], name="track_genome_order_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="track",
+            constraint=models.UniqueConstraint(models.F("genome_id"), models.F("label"), models.F("additional_info"), django.db.models.functions.text.MD5(django.db.models.functions.comparison.Cast("datafiles", models.TextField())), name="unique_track"),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.11 on 2026-10-17 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0005_track_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenomePayload",
+            fields=[
+                ("genome_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("body", models.BinaryField()),
+                ("etag", models.CharField(max_length=50)),
+                ("version", models.PositiveIntegerField(default=1)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name="track",
+            options={"ordering": ["display_order", "id"]},
+        ),
+    ]
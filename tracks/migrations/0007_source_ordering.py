@@ -0,0 +1,17 @@
+# Generated by Django 4.1.11 on 2026-10-17 20:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0006_genomepayload"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="source",
+            options={"ordering": ["id"]},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.11 on 2026-10-17 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0007_source_ordering"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genomepayload",
+            name="body_br",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name="genomepayload",
+            name="body_gzip",
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.11 on 2026-10-17 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0008_genomepayload_compressed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="track",
+            name="datafile_info",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 4.1.11 on 2026-10-17 20:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.utils import timezone
+
+
+def create_initial_release(apps, schema_editor):
+    # existing tracks are moved to an "initial" release, live for all genomes
+    Release = apps.get_model("tracks", "Release")
+    GenomeRelease = apps.get_model("tracks", "GenomeRelease")
+    Track = apps.get_model("tracks", "Track")
+    release = Release.objects.create(name="initial", activated=timezone.now())
+    Track.objects.update(release=release)
+    genome_ids = Track.objects.order_by("genome_id").values_list("genome_id", flat=True).distinct()
+    GenomeRelease.objects.bulk_create([GenomeRelease(genome_id=genome_id, release=release) for genome_id in genome_ids], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0009_track_datafile_info"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Release",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("activated", models.DateTimeField(null=True)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="GenomeRelease",
+            fields=[
+                ("genome_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("release", models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name="genomes", to="tracks.release")),
+            ],
+        ),
+        migrations.AddField(
+            model_name="track",
+            name="release",
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="tracks", to="tracks.release"),
+        ),
+        migrations.RunPython(create_initial_release, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="track",
+            name="release",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name="tracks", to="tracks.release"),
+        ),
+        migrations.RemoveIndex(
+            model_name="track",
+            name="track_genome_order_idx",
+        ),
+        migrations.RemoveConstraint(
+            model_name="track",
+            name="unique_track",
+        ),
+        migrations.AddIndex(
+            model_name="track",
+            index=models.Index(fields=["genome_id", "release", "display_order"], name="track_genome_release_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="track",
+            index=models.Index(fields=["release", "id"], name="track_release_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="track",
+            constraint=models.UniqueConstraint(models.F("genome_id"), models.F("release"), models.F("label"), models.F("additional_info"), django.db.models.functions.text.MD5(django.db.models.functions.comparison.Cast("datafiles", models.TextField())), name="unique_track"),
+        ),
+        # stored payloads are keyed by genome and release (rebuilt with rebuild_payloads command)
+        migrations.DeleteModel(
+            name="GenomePayload",
+        ),
+        migrations.CreateModel(
+            name="GenomePayload",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("genome_id", models.UUIDField()),
+                ("body", models.BinaryField()),
+                ("body_br", models.BinaryField(null=True)),
+                ("body_gzip", models.BinaryField(null=True)),
+                ("etag", models.CharField(max_length=50)),
+                ("version", models.PositiveIntegerField(default=1)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("release", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="payloads", to="tracks.release")),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="genomepayload",
+            constraint=models.UniqueConstraint(fields=("genome_id", "release"), name="unique_genome_payload"),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.1.11 on 2026-10-17 21:19
+
+from hashlib import md5
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+def chromosome_set_digest(chromosomes):
+    # same as serializers.chromosome_set_digest
+    return md5("\n".join(chromosomes).encode()).hexdigest()
+
+
+def move_chromosome_lists(apps, schema_editor):
+    # chromosome lists in track datafile info are stored as chromosome sets (once per genome) and referenced by digest
+    Track = apps.get_model("tracks", "Track")
+    ChromosomeSet = apps.get_model("tracks", "ChromosomeSet")
+    tracks = Track.objects.extra(where=["jsonb_path_exists(datafile_info, '$.*.chromosomes')"]).only("genome_id", "datafile_info")
+    for track in tracks.iterator():
+        chromosome_sets = {}
+        for info in track.datafile_info.values():
+            if(isinstance(info, dict) and isinstance(info.get("chromosomes"), list)):
+                chromosomes = info.pop("chromosomes")
+                info["chromosome_set"] = chromosome_set_digest(chromosomes)
+                info["chromosome_count"] = len(chromosomes)
+                chromosome_sets[info["chromosome_set"]] = chromosomes
+        ChromosomeSet.objects.bulk_create([
+            ChromosomeSet(genome_id=track.genome_id, digest=digest, chromosomes=chromosomes) for digest, chromosomes in chromosome_sets.items()
+        ], ignore_conflicts=True)
+        Track.objects.filter(id=track.id).update(datafile_info=track.datafile_info)
+
+
+def inline_chromosome_lists(apps, schema_editor):
+    Track = apps.get_model("tracks", "Track")
+    ChromosomeSet = apps.get_model("tracks", "ChromosomeSet")
+    tracks = Track.objects.extra(where=["jsonb_path_exists(datafile_info, '$.*.chromosome_set')"]).only("genome_id", "datafile_info")
+    for track in tracks.iterator():
+        chromosome_sets = dict(ChromosomeSet.objects.filter(genome_id=track.genome_id).values_list("digest", "chromosomes"))
+        for info in track.datafile_info.values():
+            if(isinstance(info, dict) and info.get("chromosome_set") in chromosome_sets):
+                info["chromosomes"] = chromosome_sets[info.pop("chromosome_set")]
+                info.pop("chromosome_count", None)
+        Track.objects.filter(id=track.id).update(datafile_info=track.datafile_info)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracks", "0010_releases"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChromosomeSet",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("genome_id", models.UUIDField()),
+                ("digest", models.CharField(max_length=32)),
+                ("chromosomes", django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="chromosomeset",
+            constraint=models.UniqueConstraint(fields=("genome_id", "digest"), name="unique_chromosome_set"),
+        ),
+        migrations.RunPython(move_chromosome_lists, inline_chromosome_lists),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.db.models.functions import Cast, MD5
 import uuid
 
 """
@@ -12,9 +13,19 @@ class Category(models.Model):
     CategoryType = models.TextChoices("CategoryType", ["Genomic","Variation","Regulation"])
     type = models.CharField(choices=CategoryType.choices, default="Genomic", max_length=20)
 
+# named set of tracks loaded together (e.g. a data release), made live per genome (see releases.py)
+class Release(models.Model):
+    name = models.CharField(unique=True, max_length=50)
+    created = models.DateTimeField(auto_now_add=True)
+    activated = models.DateTimeField(null=True) #last made live (None: still loading)
+
+    class Meta:
+        ordering = ["id"]
+
 class Track(models.Model):
     track_id = models.UUIDField(unique=True, editable=False, default=uuid.uuid4) #auto-generate track IDs
     genome_id = models.UUIDField()
+    release = models.ForeignKey(Release, related_name="tracks", on_delete=models.PROTECT, db_index=False) #see track_release_idx
     category = models.ForeignKey(Category, related_name="tracks", on_delete=models.CASCADE)
     label = models.CharField(max_length=50)
     trigger = ArrayField(models.CharField(max_length=50))
@@ -27,10 +38,19 @@ class Track(models.Model):
     additional_info = models.CharField(blank=True, default="", max_length=50)
     description = models.TextField(blank=True, default="")
     settings = models.JSONField(blank=True, default=dict)
+    datafile_info = models.JSONField(blank=True, default=dict) #datafile headers (format, size, zoom levels, chromosome set) by datafiles key
+    updated = models.DateTimeField(auto_now=True) #content version for ETags
 
     class Meta:
-        ordering = ["display_order"]
-        constraints = [models.UniqueConstraint(fields=["genome_id", "label", "additional_info", "datafiles"], name="unique_track")]
+        ordering = ["display_order", "id"] #id: stable order for tracks with the same display_order
+        indexes = [
+            models.Index(fields=["genome_id", "release", "display_order"], name="track_genome_release_idx"),
+            models.Index(fields=["release", "id"], name="track_release_idx"), #tracks of a release in batches (activation, pruning)
+        ]
+        constraints = [
+            # datafiles are hashed to keep the unique index narrow
+            models.UniqueConstraint("genome_id", "release", "label", "additional_info", MD5(Cast("datafiles", models.TextField())), name="unique_track")
+        ]
 
 class Source(models.Model):
     track = models.ManyToManyField(Track, related_name="sources")
@@ -38,4 +58,33 @@ class Source(models.Model):
     url = models.URLField()
 
     class Meta:
+        ordering = ["id"]
         constraints = [models.UniqueConstraint(fields=["name", "url"], name="unique_source")]
+
+# active release of a genome (its tracks are served by the read endpoints)
+class GenomeRelease(models.Model):
+    genome_id = models.UUIDField(primary_key=True)
+    release = models.ForeignKey(Release, related_name="genomes", on_delete=models.PROTECT)
+
+# rendered track_categories payload of a genome in a release, rebuilt whenever its tracks are changed via the API
+class GenomePayload(models.Model):
+    genome_id = models.UUIDField()
+    release = models.ForeignKey(Release, related_name="payloads", on_delete=models.CASCADE)
+    body = models.BinaryField()
+    body_br = models.BinaryField(null=True) #compressed variants (None for small payloads)
+    body_gzip = models.BinaryField(null=True)
+    etag = models.CharField(max_length=50)
+    version = models.PositiveIntegerField(default=1) #incremented on every rebuild
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["genome_id", "release"], name="unique_genome_payload")]
+
+# chromosome/region names in datafile headers, stored once per genome and referenced from Track.datafile_info by digest
+class ChromosomeSet(models.Model):
+    genome_id = models.UUIDField()
+    digest = models.CharField(max_length=32) #md5 of the newline-joined names (see serializers.chromosome_set_digest)
+    chromosomes = ArrayField(models.TextField())
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["genome_id", "digest"], name="unique_chromosome_set")]
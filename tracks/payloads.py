@@ -0,0 +1,178 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from .models import GenomePayload, Source, Track
+from .compression import compress_payload
+from .renderers import render_json
+from .instrumentation import timer
+from . import aggregation, cache, etags, releases
+
+"""
+Read-only serialization for track and track_categories endpoints: payloads are
+built from .values() rows instead of model instances and serializers. Output is
+the same as CategorySerializer, CategoryTrackSerializer and ReadTrackSerializer.
+track_categories payload can also be built in the database (TRACK_CATEGORIES_ENGINE
+setting: "orm" or "postgres", see aggregation.py). Rendered payloads are stored in
+GenomePayload table (with compressed variants, see compression.py) and rebuilt in
+the same transaction as every write to a genome, per genome and release (reads get the
+payload of the active release, see releases.py).
+Functions prefixed with "a" are async variants (async ORM) used by async_views.py.
+"""
+
+CATEGORY_FIELDS = ["label", "track_category_id", "type"]
+TRACK_FIELDS = ["track_id", "label", "colour", "trigger", "type", "display_order", "on_by_default", "additional_info", "sources"]
+CATEGORY_TRACK_FIELDS = TRACK_FIELDS + ["description"]
+READ_TRACK_FIELDS = TRACK_FIELDS + ["datafiles", "settings", "datafile_info"]
+
+def track_columns(fields, with_category=False):
+    columns = ["id", "updated"] + [field for field in fields if field != "sources"]
+    if(with_category):
+        columns += ["category_id"] + [f"category__{field}" for field in CATEGORY_FIELDS]
+    return columns
+
+def track_sources(track_pks):
+    """
+    (track pk, source name, source url) rows for a list of tracks, in Source model order.
+    """
+    links = Source.track.through.objects.filter(track_id__in=track_pks).order_by("source_id")
+    return links.values_list("track_id", "source__name", "source__url")
+
+def add_sources(rows, links):
+    sources = {row["id"]: [] for row in rows}
+    for track_pk, name, url in links:
+        sources[track_pk].append({"name": name, "url": url})
+    for row in rows:
+        row["track_id"] = str(row["track_id"])
+        row["sources"] = sources[row["id"]]
+    return rows
+
+def get_track_rows(tracks, fields, with_category=False):
+    """
+    Fetch track rows (including sources) for a track queryset in two queries.
+    Rows also hold "updated" field (for ETags) and category fields if requested.
+    """
+    rows = list(tracks.values(*track_columns(fields, with_category)))
+    return add_sources(rows, track_sources([row["id"] for row in rows]))
+
+async def aget_track_rows(tracks, fields, with_category=False):
+    rows = [row async for row in tracks.values(*track_columns(fields, with_category))]
+    links = [link async for link in track_sources([row["id"] for row in rows])]
+    return add_sources(rows, links)
+
+def track_payload(row, fields=READ_TRACK_FIELDS):
+    return {field: row[field] for field in fields}
+
+def group_by_category(rows):
+    """
+    Group track rows (fetched with_category) into track_categories payload.
+    """
+    categories = {}
+    with timer("serialize_time"):
+        for row in rows:
+            if(row["category_id"] not in categories):
+                categories[row["category_id"]] = {field: row[f"category__{field}"] for field in CATEGORY_FIELDS}
+                categories[row["category_id"]]["track_list"] = []
+            categories[row["category_id"]]["track_list"].append(track_payload(row, CATEGORY_TRACK_FIELDS))
+    return list(categories.values())
+
+def rows_payload(genome_id, rows):
+    if(not rows):
+        return None
+    body = render_json({"track_categories": group_by_category(rows)})
+    return cache.Payload(body=body, etag=etags.tracks_etag(genome_id, rows))
+
+def aggregate_payload(genome_id, result):
+    if(result is None):
+        return None
+    body, track_count, last_updated = result
+    return cache.Payload(body=body, etag=etags.genome_etag(genome_id, track_count, last_updated))
+
+def genome_payload(genome_id, release_id=None):
+    """
+    Rendered track_categories payload for a genome (with its ETag) in a release (default: active release),
+    or None if the genome has no tracks.
+    """
+    if(settings.TRACK_CATEGORIES_ENGINE == "postgres"):
+        return aggregate_payload(genome_id, aggregation.get_track_categories(genome_id, release_id))
+    # fixed number of queries: tracks joined with categories + one query for all sources
+    return rows_payload(genome_id, get_track_rows(releases.genome_tracks(genome_id, release_id), CATEGORY_TRACK_FIELDS, with_category=True))
+
+async def agenome_payload(genome_id):
+    if(settings.TRACK_CATEGORIES_ENGINE == "postgres"):
+        return aggregate_payload(genome_id, await sync_to_async(aggregation.get_track_categories)(genome_id))
+    return rows_payload(genome_id, await aget_track_rows(releases.genome_tracks(genome_id), CATEGORY_TRACK_FIELDS, with_category=True))
+
+STORED_PAYLOAD_FIELDS = ["body", "etag", "body_br", "body_gzip"]
+
+def stored_payload(genome_id):
+    return GenomePayload.objects.filter(genome_id=genome_id, release_id=releases.active_release(genome_id)).values_list(*STORED_PAYLOAD_FIELDS)
+
+def row_payload(body, etag, body_br, body_gzip):
+    encodings = {encoding: bytes(variant) for encoding, variant in [("br", body_br), ("gzip", body_gzip)] if variant is not None}
+    return cache.Payload(body=bytes(body), etag=etag, encodings=encodings)
+
+def get_stored_payload(genome_id):
+    """
+    Rendered track_categories payload from GenomePayload table (None if not stored).
+    """
+    row = stored_payload(genome_id).first()
+    return row_payload(*row) if row else None
+
+async def aget_stored_payload(genome_id):
+    row = await stored_payload(genome_id).afirst()
+    return row_payload(*row) if row else None
+
+def get_genome_payloads(genome_ids):
+    """
+    Rendered track_categories payloads for a list of genomes (genome_id => Payload, genomes without tracks are left out).
+    Uses a fixed number of queries: cached payloads, then stored payloads (one query) and a build from tracks (two queries).
+    """
+    genome_payloads = {}
+    versions = {}
+    for genome_id in genome_ids:
+        payload, versions[genome_id] = cache.get_payload(genome_id)
+        if(payload is not None):
+            genome_payloads[genome_id] = payload
+    uncached = [genome_id for genome_id in genome_ids if genome_id not in genome_payloads]
+    if(uncached):
+        stored = GenomePayload.objects.filter(releases.is_active(), genome_id__in=uncached)
+        for genome_id, *row in stored.values_list("genome_id", *STORED_PAYLOAD_FIELDS):
+            genome_payloads[str(genome_id)] = row_payload(*row)
+    pending = [genome_id for genome_id in uncached if genome_id not in genome_payloads]
+    if(pending):
+        genome_rows = {}
+        fields = CATEGORY_TRACK_FIELDS + ["genome_id"]
+        for row in get_track_rows(Track.objects.filter(releases.is_active(), genome_id__in=pending), fields, with_category=True):
+            genome_rows.setdefault(str(row["genome_id"]), []).append(row)
+        for genome_id, rows in genome_rows.items():
+            body = render_json({"track_categories": group_by_category(rows)})
+            genome_payloads[genome_id] = cache.Payload(body=body, etag=etags.tracks_etag(genome_id, rows))
+    for genome_id in uncached:
+        if(genome_id in genome_payloads):
+            cache.set_payload(genome_id, genome_payloads[genome_id], versions[genome_id])
+    return genome_payloads
+
+UPSERT_PAYLOAD_SQL = f"""
+INSERT INTO {GenomePayload._meta.db_table} (genome_id, release_id, body, etag, body_br, body_gzip, version, updated)
+VALUES (%s, %s, %s, %s, %s, %s, 1, now())
+ON CONFLICT (genome_id, release_id) DO UPDATE SET body = EXCLUDED.body, etag = EXCLUDED.etag,
+    body_br = EXCLUDED.body_br, body_gzip = EXCLUDED.body_gzip,
+    version = {GenomePayload._meta.db_table}.version + 1, updated = EXCLUDED.updated
+"""
+
+@transaction.atomic(savepoint=False)
+def rebuild(genome_id, release_id):
+    """
+    Rebuild stored payload for a genome in a release (removed if it has no tracks) and drop the cached payload.
+    Called at the end of every write transaction touching the genome.
+    """
+    with connection.cursor() as cursor:
+        # concurrent rebuilds of a genome wait for each other, so the last one sees all committed writes
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [str(genome_id)])
+        payload = genome_payload(genome_id, release_id)
+        if(payload is None):
+            GenomePayload.objects.filter(genome_id=genome_id, release_id=release_id).delete()
+        else:
+            encodings = compress_payload(payload.body) #compressed once per write
+            cursor.execute(UPSERT_PAYLOAD_SQL, [str(genome_id), release_id, payload.body, payload.etag, encodings.get("br"), encodings.get("gzip")])
+    cache.invalidate(genome_id)
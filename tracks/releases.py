@@ -0,0 +1,122 @@
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+from .models import ChromosomeSet, GenomePayload, GenomeRelease, Release, Source, Track
+from . import cache
+
+"""
+Track releases: every track belongs to a release (a named set of tracks loaded together,
+e.g. by submit_tracks.py --stage), and each genome points to its active release
+(GenomeRelease table). Read endpoints only serve the tracks of the active release of a
+genome, so a new release can be loaded in the background and made live for all of its
+genomes at once by moving the pointers (one upsert, see activate). Writes without
+a release go to the active release of the genome. Tracks of releases that are no longer
+active are removed in small batches (see prune), so old releases can be dropped without
+long locks on the tracks table.
+"""
+
+def active_release(genome_id):
+    """
+    Active release id of a genome (subquery).
+    """
+    return Subquery(GenomeRelease.objects.filter(genome_id=genome_id).values("release_id"))
+
+def is_active():
+    """
+    Filter for querysets with genome_id and release fields: rows of the active release of their genome.
+    """
+    return Exists(GenomeRelease.objects.filter(genome_id=OuterRef("genome_id"), release_id=OuterRef("release_id")))
+
+def genome_tracks(genome_id, release_id=None):
+    """
+    Tracks of a genome in a release (default: active release of the genome).
+    """
+    return Track.objects.filter(genome_id=genome_id, release_id=release_id or active_release(genome_id))
+
+def current_release():
+    """
+    Release for genomes written to without a release: the last activated release (created if there is none).
+    """
+    release = Release.objects.filter(activated__isnull=False).order_by("-activated", "-id").first()
+    if(release is None):
+        release, created = Release.objects.get_or_create(name="default", defaults={"activated": timezone.now()})
+    return release
+
+def write_releases(genome_ids):
+    """
+    Target releases of a write without a release: {genome_id: release_id} with the active release of each genome,
+    or (new genomes) the current release which is made active for them.
+    """
+    release_ids = dict(GenomeRelease.objects.filter(genome_id__in=genome_ids).values_list("genome_id", "release_id"))
+    new_genomes = [genome_id for genome_id in genome_ids if genome_id not in release_ids]
+    if(new_genomes):
+        release = current_release()
+        GenomeRelease.objects.bulk_create([GenomeRelease(genome_id=genome_id, release=release) for genome_id in new_genomes], ignore_conflicts=True)
+        release_ids.update(GenomeRelease.objects.filter(genome_id__in=new_genomes).values_list("genome_id", "release_id"))
+    return release_ids
+
+def write_release(genome_id):
+    genome_id, release_id = write_releases([genome_id]).popitem()
+    return release_id
+
+ACTIVATE_SQL = f"""
+INSERT INTO {GenomeRelease._meta.db_table} (genome_id, release_id)
+SELECT DISTINCT genome_id, release_id FROM {Track._meta.db_table} WHERE release_id = %s
+ON CONFLICT (genome_id) DO UPDATE SET release_id = EXCLUDED.release_id
+RETURNING genome_id
+"""
+
+@transaction.atomic
+def activate(release):
+    """
+    Make a release live for all genomes that have tracks in it. Returns the nr of genomes.
+    Payloads of the release are already stored (rebuilt on every write), so only the pointers change.
+    """
+    Release.objects.filter(id=release.id).update(activated=timezone.now()) #row lock: prune batches wait for the switch
+    with connection.cursor() as cursor:
+        cursor.execute(ACTIVATE_SQL, [release.id])
+        genome_ids = [genome_id for genome_id, in cursor.fetchall()]
+    for genome_id in genome_ids:
+        cache.invalidate(genome_id)
+    return len(genome_ids)
+
+def prune(release, batch_size=5000):
+    """
+    Delete the tracks of a release that are not active for their genome, in batches of one short transaction each.
+    The release itself is deleted once no genome points to it. Yields the nr of tracks deleted in each batch.
+    """
+    last_id = 0
+    while(True):
+        with transaction.atomic():
+            Release.objects.select_for_update().filter(id=release.id).first() #waits for a concurrent activation
+            # next batch in id order (track_release_idx), so each track is scanned once
+            tracks = Track.objects.filter(release_id=release.id, id__gt=last_id).exclude(is_active()).order_by("id")
+            track_ids = list(tracks.values_list("id", flat=True)[:batch_size])
+            if(not track_ids):
+                break
+            # direct deletes (the ORM collector would fetch the rows and delete them 100 at a time)
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {Source.track.through._meta.db_table} WHERE track_id = ANY(%s)", [track_ids])
+                cursor.execute(f"DELETE FROM {Track._meta.db_table} WHERE id = ANY(%s)", [track_ids])
+                deleted = cursor.rowcount
+        last_id = track_ids[-1]
+        yield deleted
+    with transaction.atomic():
+        GenomePayload.objects.filter(release_id=release.id).exclude(is_active()).delete()
+        if(not GenomeRelease.objects.filter(release_id=release.id).exists()):
+            Release.objects.filter(id=release.id).delete()
+
+UNUSED_CHROMOSOME_SETS_SQL = f"""
+DELETE FROM {ChromosomeSet._meta.db_table} chromosome_set WHERE NOT EXISTS (
+    SELECT 1 FROM {Track._meta.db_table} track WHERE track.genome_id = chromosome_set.genome_id
+    AND jsonb_path_exists(track.datafile_info, '$.*.chromosome_set ? (@ == $digest)', jsonb_build_object('digest', chromosome_set.digest))
+)
+"""
+
+def prune_chromosome_sets():
+    """
+    Delete chromosome sets no track refers to anymore (e.g. after pruning releases). Returns the nr of deleted sets.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(UNUSED_CHROMOSOME_SETS_SQL)
+        return cursor.rowcount
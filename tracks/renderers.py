@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from .instrumentation import timer
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+JSON rendering for Track API responses.
+FastJSONRenderer uses orjson when it is installed and otherwise falls back to
+the stock DRF JSONRenderer. Output is the same as JSONRenderer (compact, UTF-8,
+\\u2028/\\u2029 escaped, datetimes and other non-JSON types converted by DRF's encoder),
+except for the formatting of some floats (same value: 1e-05 => 0.00001, 1e+16 => 1e16)
+and NaN/Infinity, which are rendered as null. Data orjson can't serialize (e.g. integers
+wider than 64 bits) is rendered by JSONRenderer.
+"""
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer("serialize_time"):
+            return self.render_json(data, accepted_media_type, renderer_context)
+
+    def render_json(self, data, accepted_media_type, renderer_context):
+        if(orjson is None or data is None or self.ensure_ascii or not self.compact
+           or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same escaping as JSONRenderer (JSON output is a strict javascript subset)
+        if(b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret):
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+def render_json(data):
+    """
+    Render data with the JSON renderer configured in REST_FRAMEWORK setting (for payloads rendered outside DRF responses).
+    """
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        if(issubclass(renderer_class, JSONRenderer)):
+            return renderer_class().render(data)
+    return FastJSONRenderer().render(data)
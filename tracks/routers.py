@@ -0,0 +1,123 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+import asyncio
+import logging
+import random
+import time
+from django.conf import settings
+from django.db import connections
+from django.db.utils import OperationalError
+from django.utils.decorators import sync_and_async_middleware
+
+"""
+Read replica routing (enabled when DATABASE_REPLICAS setting lists replica hosts).
+Reads of GET/HEAD requests go to one replica per request (picked at random), as do
+requests to read-only views (replica_reads attribute, e.g. POST track_categories). All
+other requests, writes and management commands use the primary ("default") database.
+Read-your-writes: once a request writes, its remaining reads use the primary, and the
+client gets a cookie that keeps its reads on the primary for DATABASE_REPLICA_PIN seconds
+(covers replication lag for loaders like submit_tracks.py that read back their writes).
+A replica that can't be reached is skipped for DATABASE_REPLICA_RETRY seconds and
+its reads fall back to another replica or the primary.
+"""
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+PIN_COOKIE = "track_api_primary"
+SAFE_METHODS = ["GET", "HEAD", "OPTIONS"]
+
+@dataclass
+class RequestRouting:
+    request: object
+    pinned: bool = False #reads go to the primary
+    wrote: bool = False
+    replica: str = None #replica chosen for the request
+
+    def primary_reads(self):
+        if(self.pinned or self.request.method in SAFE_METHODS):
+            return self.pinned
+        # other methods: decided on the first read (the view is resolved by then)
+        match = self.request.resolver_match
+        view_class = getattr(match.func, "cls", None) if match else None
+        self.pinned = not getattr(view_class, "replica_reads", False) #write endpoints read existing rows before writing
+        return self.pinned
+
+current_routing = ContextVar("current_routing", default=None)
+
+unreachable = {} #replica alias => time (monotonic) until which it is skipped
+
+def is_reachable(alias):
+    if(unreachable.get(alias, 0) > time.monotonic()):
+        return False
+    connection = connections[alias]
+    try:
+        connection.close_if_health_check_failed() #persistent connection to a replica that went away
+        connection.ensure_connection()
+    except OperationalError as e:
+        logger.warning("Database replica %s is unreachable, skipped for %ss: %s", alias, settings.DATABASE_REPLICA_RETRY, e)
+        unreachable[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY
+        return False
+    return True
+
+def choose_replica():
+    """
+    Alias of a reachable replica (at random), or the primary if none is reachable.
+    """
+    replicas = list(settings.DATABASE_REPLICA_ALIASES)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if(is_reachable(alias)):
+            return alias
+    return PRIMARY
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if(routing is None or routing.primary_reads()): #outside requests (e.g. management commands), write requests or after a write
+            return PRIMARY
+        if(routing.replica is None):
+            routing.replica = choose_replica()
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if(routing is not None):
+            routing.pinned = routing.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True #same data on all databases
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY
+
+def request_routing(request):
+    return RequestRouting(request, pinned=PIN_COOKIE in request.COOKIES)
+
+def add_pin_cookie(response, routing):
+    if(routing.wrote and settings.DATABASE_REPLICA_PIN):
+        response.set_cookie(PIN_COOKIE, "1", max_age=settings.DATABASE_REPLICA_PIN, httponly=True, samesite="Lax")
+    return response
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if(asyncio.iscoroutinefunction(get_response)):
+        async def middleware(request):
+            routing = request_routing(request)
+            token = current_routing.set(routing)
+            try:
+                response = await get_response(request)
+            finally:
+                current_routing.reset(token)
+            return add_pin_cookie(response, routing)
+    else:
+        def middleware(request):
+            routing = request_routing(request)
+            token = current_routing.set(routing)
+            try:
+                response = get_response(request)
+            finally:
+                current_routing.reset(token)
+            return add_pin_cookie(response, routing)
+    return middleware
@@ -1,5 +1,10 @@
-from .models import Category, Track, Source
+from .models import Category, ChromosomeSet, Release, Track, Source
+from . import payloads, releases
 from rest_framework import serializers
+from django.db import transaction
+from django.utils import timezone
+from hashlib import md5
+import json
 
 """
 Serializers for Track API datamodels
@@ -26,7 +31,7 @@ class CategoryTrackSerializer(BaseTrackSerializer):
 # track payload in "track" endpoint (consumed by genome browser)
 class ReadTrackSerializer(BaseTrackSerializer):
     class Meta(BaseTrackSerializer.Meta):
-        fields = BaseTrackSerializer.Meta.fields + ["datafiles", "settings"]
+        fields = BaseTrackSerializer.Meta.fields + ["datafiles", "settings", "datafile_info"]
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,25 +41,161 @@ class CategorySerializer(serializers.ModelSerializer):
             "track_category_id": {"validators": []}
         }
 
+# full track record in "tracks" endpoint (consumed by track submission script)
+class FullTrackSerializer(BaseTrackSerializer):
+    category = CategorySerializer()
+
+    class Meta(BaseTrackSerializer.Meta):
+        fields = BaseTrackSerializer.Meta.fields + ["genome_id", "category", "datafiles", "description", "settings", "datafile_info"]
+
+# batch track submission (same rules as WriteTrackSerializer.create, with a fixed nr of queries)
+class BulkWriteTrackSerializer(serializers.ListSerializer):
+    batch_size = 1000
+
+    @staticmethod
+    def track_key(genome_id, release_id, label, additional_info, datafiles):
+        # fields in "unique_track" constraint
+        return (str(genome_id), release_id, label, additional_info, json.dumps(datafiles, sort_keys=True))
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """
+        Creates or updates a list of tracks. Returns track objects or error messages (in input order).
+        """
+        categories = get_categories([data["category"] for data in validated_data])
+        store_chromosome_sets(validated_data)
+        sources = get_sources([source for data in validated_data for source in data.get("sources", [])])
+        named_releases = get_releases({data["release"] for data in validated_data if data.get("release")})
+        active_releases = releases.write_releases({data["genome_id"] for data in validated_data if not data.get("release")})
+        release_ids = [named_releases[data["release"]].id if data.get("release") else active_releases[data["genome_id"]] for data in validated_data]
+        genome_ids = {data["genome_id"] for data in validated_data}
+        existing_tracks = Track.objects.filter(genome_id__in=genome_ids, release_id__in=set(release_ids), label__in={data["label"] for data in validated_data})
+        tracks = {
+            self.track_key(track.genome_id, track.release_id, track.label, track.additional_info, track.datafiles): track
+            for track in existing_tracks.select_related("category")
+        }
+        existing_ids = {track.id for track in tracks.values()}
+        track_sources = []
+        results = []
+        for data, release_id in zip(validated_data, release_ids):
+            category = categories[data["category"]["track_category_id"]]
+            track_data = {field: value for field, value in data.items() if field not in ("category", "sources", "release")}
+            key = self.track_key(data["genome_id"], release_id, data["label"], data.get("additional_info", ""), data.get("datafiles", {}))
+            track = tracks.get(key)
+            if(track is None):
+                track = tracks[key] = Track(category=category, release_id=release_id)
+            elif(track.category_id != category.id): #update_or_create lookup includes category
+                results.append(f"Track already exists in category {track.category.track_category_id}")
+                continue
+            for field, value in track_data.items():
+                setattr(track, field, value)
+            if(track.trigger[1].startswith("expand")): #hack for expansion tracks
+                track.trigger = track.trigger + [str(track.track_id)]
+            track_sources += [(track, sources[(source["name"], source["url"])]) for source in data.get("sources", [])]
+            results.append(track)
+        submitted_tracks = {track.track_id: track for track in results if isinstance(track, Track)}.values()
+        updated_tracks = [track for track in submitted_tracks if track.id in existing_ids]
+        now = timezone.now()
+        for track in updated_tracks:
+            track.updated = now #auto_now is not applied by bulk_update
+        Track.objects.bulk_create([track for track in submitted_tracks if track.id is None], batch_size=self.batch_size)
+        Track.objects.bulk_update(updated_tracks, [field.name for field in Track._meta.concrete_fields if not field.primary_key], batch_size=self.batch_size)
+        Source.track.through.objects.bulk_create(
+            [Source.track.through(track_id=track.id, source_id=source.id) for track, source in track_sources],
+            batch_size=self.batch_size, ignore_conflicts=True
+        )
+        # sorted: concurrent bulk writes take the rebuild locks (per genome) in the same order
+        for genome_id, release_id in sorted({(str(data["genome_id"]), release_id) for data, release_id in zip(validated_data, release_ids)}):
+            payloads.rebuild(genome_id, release_id)
+        return results
+
+def get_categories(categories_data):
+    """
+    Get or create categories in bulk. Returns a dict of category objects keyed by track_category_id.
+    """
+    categories_data = {data["track_category_id"]: data for data in categories_data}
+    Category.objects.bulk_create([Category(**data) for data in categories_data.values()], ignore_conflicts=True)
+    return {category.track_category_id: category for category in Category.objects.filter(track_category_id__in=categories_data)}
+
+def get_releases(names):
+    """
+    Get or create (loading) releases in bulk. Returns a dict of release objects keyed by name.
+    """
+    Release.objects.bulk_create([Release(name=name) for name in names], ignore_conflicts=True)
+    return {release.name: release for release in Release.objects.filter(name__in=names)}
+
+def get_sources(sources_data):
+    """
+    Get or create sources in bulk. Returns a dict of source objects keyed by (name, url).
+    """
+    keys = {(data["name"], data["url"]) for data in sources_data}
+    Source.objects.bulk_create([Source(name=name, url=url) for name, url in keys], ignore_conflicts=True)
+    sources = Source.objects.filter(name__in={name for name, url in keys}, url__in={url for name, url in keys})
+    return {(source.name, source.url): source for source in sources if (source.name, source.url) in keys}
+
+def chromosome_set_digest(chromosomes):
+    return md5("\n".join(chromosomes).encode()).hexdigest()
+
+def store_chromosome_sets(tracks_data):
+    """
+    Replace chromosome lists in the datafile info of track payloads with references to chromosome sets
+    (stored once per genome, see ChromosomeSet), creating the sets in bulk.
+    """
+    chromosome_sets = {}
+    for data in tracks_data:
+        datafile_info = {}
+        for key, info in data.get("datafile_info", {}).items():
+            if(isinstance(info, dict) and "chromosomes" in info):
+                chromosomes = info["chromosomes"]
+                digest = chromosome_set_digest(chromosomes)
+                chromosome_sets[(str(data["genome_id"]), digest)] = chromosomes
+                info = {**{field: value for field, value in info.items() if field != "chromosomes"}, "chromosome_set": digest, "chromosome_count": len(chromosomes)}
+            datafile_info[key] = info
+        if("datafile_info" in data):
+            data["datafile_info"] = datafile_info
+    ChromosomeSet.objects.bulk_create([
+        ChromosomeSet(genome_id=genome_id, digest=digest, chromosomes=chromosomes) for (genome_id, digest), chromosomes in chromosome_sets.items()
+    ], ignore_conflicts=True)
+
 # track submission payload
 class WriteTrackSerializer(BaseTrackSerializer):
     category = CategorySerializer(write_only=True)
+    release = serializers.CharField(write_only=True, required=False, max_length=50) #release name (default: active release of the genome)
 
     class Meta(BaseTrackSerializer.Meta):
-        fields = BaseTrackSerializer.Meta.fields + ["genome_id", "category", "datafiles", "additional_info", "description", "settings"]
+        fields = BaseTrackSerializer.Meta.fields + ["genome_id", "category", "datafiles", "additional_info", "description", "settings", "datafile_info", "release"]
         extra_kwargs = {
             "genome_id": {"write_only": True}
         }
         validators = [] # ignore uniqueness constraint
+        list_serializer_class = BulkWriteTrackSerializer
+
+    def validate_datafile_info(self, value):
+        """
+        Chromosome lists are stored once per genome (see store_chromosome_sets): the names can run to tens of thousands
+        per datafile, repeated in many tracks.
+        """
+        if(not isinstance(value, dict)):
+            raise serializers.ValidationError("Expected an object keyed like datafiles.")
+        for info in value.values():
+            chromosomes = info.get("chromosomes", []) if isinstance(info, dict) else []
+            if(not isinstance(chromosomes, list) or not all(isinstance(name, str) for name in chromosomes)):
+                raise serializers.ValidationError("Expected a list of names in chromosomes.")
+        return value
     
+    @transaction.atomic # tracks & sources are updated together (see Track.updated)
     def create(self, validated_data):
         category_data = validated_data.pop('category')
         category_id = category_data.pop('track_category_id')
         category_obj, created = Category.objects.get_or_create(track_category_id=category_id, defaults=category_data)
+        store_chromosome_sets([validated_data])
         sources = validated_data.pop('sources') if 'sources' in validated_data else []
+        release_name = validated_data.pop("release", None)
+        release_id = get_releases([release_name])[release_name].id if release_name else releases.write_release(validated_data["genome_id"])
         track_obj, created = Track.objects.update_or_create(
             category=category_obj,
             genome_id=validated_data["genome_id"],
+            release_id=release_id,
             label=validated_data["label"],
             additional_info=validated_data.get("additional_info",""),
             datafiles=validated_data["datafiles"],
@@ -66,4 +207,5 @@ class WriteTrackSerializer(BaseTrackSerializer):
         for source in sources:
             source_obj, created = Source.objects.get_or_create(**source)
             track_obj.sources.add(source_obj)
+        payloads.rebuild(track_obj.genome_id, release_id)
         return track_obj
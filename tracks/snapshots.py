@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+import gzip
+import json
+import sys
+from django.db import connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from .models import Category, ChromosomeSet, GenomePayload, GenomeRelease, Release, Source, Track
+
+"""
+Snapshots of the tracks tables (Category, Source, Release, Track, track sources,
+active releases and chromosome sets of genomes) for moving a full data release between environments.
+A snapshot is a stream of Postgres COPY text-format sections, each preceded by a JSON
+header line with its table and columns:
+  {"format": "track-api-snapshot", "version": 1, "migration": ..., "created": ...}
+  {"table": "tracks_category", "columns": ["id", ...]}
+  <COPY rows>
+  \\.
+  ...
+Rows are streamed from/to the database with COPY (constant memory), database ids are
+kept as they are (stable track_ids and links). Import replaces the contents of the
+tables in one transaction, with secondary indexes and foreign keys rebuilt after the load.
+"""
+
+FORMAT = "track-api-snapshot"
+VERSION = 1
+END_OF_DATA = b"\\.\n"
+MODELS = [Category, Source, Release, Track, Source.track.through, GenomeRelease, ChromosomeSet]
+
+class SnapshotError(Exception):
+    pass
+
+def open_snapshot(path, mode):
+    """
+    Open a snapshot file for binary reading/writing ("-" for stdin/stdout), gzipped if the filename ends with .gz.
+    """
+    if(path == "-"):
+        return open((sys.stdin if mode == "rb" else sys.stdout).fileno(), mode, closefd=False)
+    if(path.endswith(".gz")):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+def table_columns(model):
+    return [field.column for field in model._meta.concrete_fields]
+
+def last_migration():
+    return MigrationRecorder.Migration.objects.filter(app="tracks").order_by("-id").values_list("name", flat=True).first()
+
+def write_line(file, data):
+    file.write(json.dumps(data).encode() + b"\n")
+
+def export_snapshot(file):
+    """
+    Write all tracks tables to a (binary) file from a consistent database snapshot. Returns row counts per table.
+    """
+    counts = {}
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(), connection.cursor() as cursor:
+        if(outermost):
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY") #same snapshot for all tables
+        write_line(file, {"format": FORMAT, "version": VERSION, "migration": last_migration(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds")})
+        for model in MODELS:
+            table, columns = model._meta.db_table, table_columns(model)
+            write_line(file, {"table": table, "columns": columns})
+            cursor.copy_expert(f"COPY (SELECT {', '.join(columns)} FROM {table} ORDER BY {model._meta.pk.column}) TO STDOUT", file)
+            file.write(END_OF_DATA)
+            counts[table] = cursor.rowcount
+    return counts
+
+class SectionReader:
+    """
+    File-like reader of the COPY rows of one section (stops at the end-of-data line).
+    """
+    def __init__(self, file):
+        self.file = file
+        self.done = False
+
+    def readline(self, size=-1):
+        if(self.done):
+            return b""
+        line = self.file.readline()
+        if(line == END_OF_DATA or not line):
+            self.done = True
+            return b""
+        return line
+
+    def read(self, size=-1):
+        lines = []
+        length = 0
+        while(length < size or size < 0):
+            line = self.readline()
+            if(not line):
+                break
+            lines.append(line)
+            length += len(line)
+        return b"".join(lines)
+
+def read_header(file):
+    line = file.readline()
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise SnapshotError(f"Invalid snapshot header: {line[:100]}")
+
+def secondary_indexes(cursor, table):
+    """
+    (name, definition) of indexes not backing a constraint (dropped during import).
+    """
+    cursor.execute("""
+        SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s
+        AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)
+    """, [table, table])
+    return cursor.fetchall()
+
+def foreign_keys(cursor, table):
+    cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [table])
+    return cursor.fetchall()
+
+@transaction.atomic
+def import_snapshot(file):
+    """
+    Replace the contents of the tracks tables with a snapshot. Returns row counts per table.
+    """
+    header = read_header(file)
+    if(header.get("format") != FORMAT or header.get("version") != VERSION):
+        raise SnapshotError("Not a Track API snapshot (or unsupported version).")
+    tables = {model._meta.db_table: model for model in MODELS}
+    counts = {}
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE") #check deferred foreign keys of earlier writes (TRUNCATE fails with them pending)
+        # stored payloads refer to releases (rebuilt after the import)
+        cursor.execute(f"TRUNCATE {', '.join(tables)}, {GenomePayload._meta.db_table}")
+        dropped_indexes = []
+        dropped_keys = []
+        for table in tables:
+            for name, definition in foreign_keys(cursor, table):
+                cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+                dropped_keys.append((table, name, definition))
+            for name, definition in secondary_indexes(cursor, table):
+                cursor.execute(f"DROP INDEX {name}")
+                dropped_indexes.append(definition)
+        for i in range(len(tables)):
+            section = read_header(file)
+            table = section.get("table")
+            if(table not in tables or table in counts):
+                raise SnapshotError(f"Unexpected table in snapshot: {table}")
+            if(sorted(section["columns"]) != sorted(table_columns(tables[table]))):
+                raise SnapshotError(f"Columns of {table} don't match the database (snapshot migration: {header['migration']}, "
+                    f"database: {last_migration()}).")
+            cursor.copy_expert(f"COPY {table} ({', '.join(section['columns'])}) FROM STDIN", SectionReader(file))
+            counts[table] = cursor.rowcount
+        for definition in dropped_indexes:
+            cursor.execute(definition)
+        for table, name, definition in dropped_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+        for table, model in tables.items():
+            if(model._meta.pk.column == "id"): #continue id sequences after the imported ids
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}", [table])
+            cursor.execute(f"ANALYZE {table}")
+    return counts
@@ -1,3 +1,927 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import decimal
+import gzip
+import importlib
+import io
+import re
+import json
+import tempfile
+import threading
+import uuid
+import yaml
+from unittest import mock, skipIf
+from django.apps import apps
+from django.conf import settings as django_settings
+from django.db import connection, IntegrityError, OperationalError
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, Client, TestCase, override_settings
+from django.urls import reverse
+from tracks.models import Category, ChromosomeSet, GenomePayload, Release, Track, Source
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from tracks.serializers import CategorySerializer, CategoryTrackSerializer, ReadTrackSerializer, chromosome_set_digest
+from tracks import async_views, cache, compression, payloads, releases, renderers, routers, views
+from ensembl_track_api import settings, settings_readonly
 
-# Create your tests here.
+
+def create_track(genome_id, category, label, display_order=2000, sources=()):
+    track = Track.objects.create(
+        genome_id=genome_id,
+        release_id=releases.write_release(genome_id),
+        category=category,
+        label=label,
+        trigger=["track", label],
+        type="regular",
+        datafiles={"regular": f"{label}.bb"},
+        display_order=display_order,
+    )
+    for name, url in sources:
+        source, created = Source.objects.get_or_create(name=name, url=url)
+        track.sources.add(source)
+    return track
+
+def populate_genome(genome_id, n_categories, tracks_per_category):
+    for c in range(n_categories):
+        category, created = Category.objects.get_or_create(
+            track_category_id=f"category-{c}", defaults={"label": f"Category {c}"}
+        )
+        for t in range(tracks_per_category):
+            create_track(genome_id, category, f"track-{c}-{t}", display_order=c*100+t,
+                sources=[(f"Source {t}", f"https://source{t}.org"), ("Shared", "https://shared.org")])
+
+
+def track_payload(genome_id, label):
+    return {
+        "genome_id": str(genome_id),
+        "category": {"track_category_id": "category-0", "label": "Category 0", "type": "Genomic"},
+        "label": label,
+        "trigger": ["track", label],
+        "type": "regular",
+        "datafiles": {"regular": f"{label}.bb"},
+        "sources": [{"name": "Shared", "url": "https://shared.org"}],
+    }
+
+
+class WriteEnabledTestCase(TestCase):
+    """
+    Enables POST/DELETE endpoints (views keep a reference to ALLOWED_METHODS list, so it is patched in-place).
+    """
+    def setUp(self):
+        allowed_methods = settings.ALLOWED_METHODS[:]
+        settings.ALLOWED_METHODS[:] = ["get", "post", "delete"]
+        self.addCleanup(settings.ALLOWED_METHODS.__setitem__, slice(None), allowed_methods)
+
+
+class GenomeTrackListTest(TestCase):
+    def test_track_categories_payload(self):
+        genome_id = uuid.uuid4()
+        populate_genome(genome_id, 2, 2)
+        response = self.client.get(reverse("tracks:genome_tracks_url", args=[genome_id]))
+        self.assertEqual(response.status_code, 200)
+        categories = response.json()["track_categories"]
+        self.assertEqual([c["track_category_id"] for c in categories], ["category-0", "category-1"])
+        self.assertEqual([t["label"] for t in categories[0]["track_list"]], ["track-0-0", "track-0-1"])
+        self.assertEqual(len(categories[1]["track_list"][0]["sources"]), 2)
+
+    def test_missing_genome(self):
+        response = self.client.get(reverse("tracks:genome_tracks_url", args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_count_is_constant(self):
+        # stored payload lookup, then tracks+categories in one query and sources in one query, regardless of genome size
+        for n_categories, tracks_per_category in [(1, 1), (3, 5), (10, 10)]:
+            genome_id = uuid.uuid4()
+            populate_genome(genome_id, n_categories, tracks_per_category)
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse("tracks:genome_tracks_url", args=[genome_id]))
+            self.assertEqual(len(response.json()["track_categories"]), n_categories)
+
+
+class GenomeBatchListTest(TestCase):
+    def setUp(self):
+        self.url = reverse("tracks:genomes_tracks_url")
+
+    def test_batch_payload(self):
+        genome_ids = [str(uuid.uuid4()) for i in range(3)]
+        populate_genome(genome_ids[0], 2, 2)
+        populate_genome(genome_ids[1], 1, 3)
+        call_command("rebuild_payloads", genome_ids[1], stdout=io.StringIO()) #stored payload
+        query = ",".join(genome_ids + [genome_ids[0]])
+        for response in [
+            self.client.get(self.url, {"genome_ids": query}),
+            self.client.post(self.url, genome_ids, content_type="application/json"),
+            self.client.post(self.url, {"genome_ids": genome_ids}, content_type="application/json"),
+        ]:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(list(data["genomes"]), genome_ids[:2])
+            for genome_id in genome_ids[:2]:
+                genome_response = self.client.get(reverse("tracks:genome_tracks_url", args=[genome_id]))
+                self.assertEqual(data["genomes"][genome_id], genome_response.json())
+            self.assertEqual(data["missing"], genome_ids[2:])
+
+    def test_query_count_is_constant(self):
+        # stored payloads in one query, other genomes built from tracks in two queries
+        for n_genomes in [2, 5, 20]:
+            genome_ids = [str(uuid.uuid4()) for i in range(n_genomes)]
+            for genome_id in genome_ids:
+                populate_genome(genome_id, 2, 2)
+            call_command("rebuild_payloads", *genome_ids[::2], stdout=io.StringIO())
+            with self.assertNumQueries(3):
+                response = self.client.get(self.url, {"genome_ids": ",".join(genome_ids)})
+            self.assertEqual(len(response.json()["genomes"]), n_genomes)
+
+    def test_invalid_genome_ids(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"genome_ids": "invalid"}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"genome_ids": "invalid"}, content_type="application/json").status_code, 400)
+
+
+class AsyncViewsTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        populate_genome(self.genome_id, 2, 2)
+        self.track_ids = [str(track_id) for track_id in Track.objects.filter(genome_id=self.genome_id).values_list("track_id", flat=True)]
+        self.factory = AsyncRequestFactory()
+
+    async def assert_same_response(self, view, url, *args, **headers):
+        expected = await sync_to_async(self.client.get)(url, **headers)
+        scope_headers = {name[5:].lower().replace("_", "-"): value for name, value in headers.items()} #HTTP_X_Y => x-y
+        response = await view(self.factory.get(url, **scope_headers), *args)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.get("ETag"), expected.get("ETag"))
+        return response
+
+    async def test_genome_track_list(self):
+        url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+        response = await self.assert_same_response(async_views.genome_track_list, url, self.genome_id)
+        await self.assert_same_response(async_views.genome_track_list, url, self.genome_id, HTTP_IF_NONE_MATCH=response["ETag"])
+        missing_id = uuid.uuid4()
+        await self.assert_same_response(async_views.genome_track_list, reverse("tracks:genome_tracks_url", args=[missing_id]), missing_id)
+
+    async def test_track_object(self):
+        url = reverse("tracks:track_url", args=[self.track_ids[0]])
+        response = await self.assert_same_response(async_views.track_object, url, self.track_ids[0])
+        await self.assert_same_response(async_views.track_object, url, self.track_ids[0], HTTP_IF_NONE_MATCH=response["ETag"])
+
+    async def test_track_list(self):
+        url = reverse("tracks:tracks_url")
+        view = async_views.with_sync_view(async_views.track_list, views.TrackList.as_view())
+        self.assertTrue(asyncio.iscoroutinefunction(view)) #run by Django as an async view
+        await self.assert_same_response(view, f"{url}?track_ids={self.track_ids[1]},{uuid.uuid4()},{self.track_ids[0]}")
+        await self.assert_same_response(view, f"{url}?genome_id={self.genome_id}") #sync view
+        response = await view(self.factory.post(url, [track_payload(self.genome_id, "new")], content_type="application/json"))
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(TRACK_CACHE_BACKEND="local", COMPRESSION_ENCODINGS=["gzip"], COMPRESSION_MIN_SIZE=0)
+    async def test_compression_threads(self):
+        await GenomePayload.objects.all().adelete() #compressed when cached
+        threads = []
+        def compress(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return compression.gzip.compress(args[0], mtime=0)
+        async def get_response(request):
+            if(request.path.startswith(reverse("tracks:tracks_url"))):
+                return await async_views.track_list(request)
+            return await async_views.genome_track_list(request, self.genome_id)
+        middleware = compression.compression_middleware(get_response)
+        urls = [reverse("tracks:genome_tracks_url", args=[self.genome_id]), f"{reverse('tracks:tracks_url')}?track_ids={self.track_ids[0]}"]
+        with mock.patch("tracks.compression.compress", side_effect=compress):
+            for url in urls:
+                response = await middleware(self.factory.get(url, accept_encoding="gzip"))
+                self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(threads), 2) #cached payload and middleware
+        self.assertNotIn(threading.get_ident(), threads) #not on the event loop
+
+
+@override_settings(INSTRUMENTATION=True, MIDDLEWARE=["tracks.instrumentation.instrumentation_middleware"] + django_settings.MIDDLEWARE)
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        self.genome_id = uuid.uuid4()
+        populate_genome(self.genome_id, 2, 2)
+
+    def test_server_timing(self):
+        response = self.client.get(reverse("tracks:genome_tracks_url", args=[self.genome_id]))
+        timings = dict(timing.strip().split(";", 1) for timing in response["Server-Timing"].split(","))
+        self.assertEqual(list(timings), ["total", "db", "serialize"])
+        self.assertIn('desc="3 queries"', timings["db"])
+
+    def test_metrics(self):
+        for i in range(2):
+            self.client.get(reverse("tracks:track_url", args=[uuid.uuid4()]))
+        metrics = self.client.get(reverse("tracks:metrics_url")).content.decode()
+        labels = 'endpoint="tracks:track_url",method="GET"'
+        self.assertIn("# TYPE track_api_request_duration_seconds histogram", metrics)
+        count = int(re.search(f"track_api_db_queries_count{{{labels}}} (\\d+)", metrics).group(1))
+        self.assertGreaterEqual(count, 2)
+        self.assertIn(f'track_api_db_queries_bucket{{{labels},le="1"}} {count}', metrics) #one query per request
+        self.assertIn(f'track_api_db_queries_bucket{{{labels},le="0"}} 0', metrics)
+
+    @override_settings(INSTRUMENTATION=False, MIDDLEWARE=django_settings.MIDDLEWARE)
+    def test_disabled(self):
+        response = self.client.get(reverse("tracks:genome_tracks_url", args=[self.genome_id]))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self.client.get(reverse("tracks:metrics_url")).status_code, 404)
+
+
+class SettingsTest(TestCase):
+    def test_env_flag(self):
+        for value, expected in [("", False), ("0", False), ("false", False), ("No", False), ("1", True), ("true", True), ("yes", True)]:
+            with self.subTest(value=value), mock.patch.dict("os.environ", {"TRACK_API_FLAG": value}):
+                self.assertEqual(settings.env_flag("TRACK_API_FLAG"), expected)
+        with mock.patch.dict("os.environ", {}, clear=True):
+            self.assertTrue(settings.env_flag("TRACK_API_FLAG", "1"))
+
+    def test_async_views_conn_max_age(self):
+        for async_views, expected in [("", 60), ("1", 0)]:
+            with self.subTest(async_views=async_views), mock.patch.dict("os.environ", {"ASYNC_VIEWS": async_views, "DATABASE_CONN_MAX_AGE": "60"}):
+                spec = importlib.util.spec_from_file_location("settings_copy", settings.__file__) #fresh copy, leaves the loaded settings alone
+                settings_copy = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(settings_copy)
+                self.assertEqual(settings_copy.DATABASES["default"]["CONN_MAX_AGE"], expected)
+
+
+class ReadOnlyProfileTest(TestCase):
+    def setUp(self):
+        self.genome_id = uuid.uuid4()
+        populate_genome(self.genome_id, 2, 2)
+
+    def test_same_responses(self):
+        track_id = Track.objects.filter(genome_id=self.genome_id).first().track_id
+        for url in [reverse("tracks:genome_tracks_url", args=[self.genome_id]), reverse("tracks:track_url", args=[track_id])]:
+            response = self.client.get(url)
+            with override_settings(MIDDLEWARE=settings_readonly.MIDDLEWARE, REST_FRAMEWORK=settings_readonly.REST_FRAMEWORK):
+                # DRF reloads its settings, but views copy authentication/permission classes at import time
+                with mock.patch.multiple(APIView, authentication_classes=api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+                                         permission_classes=api_settings.DEFAULT_PERMISSION_CLASSES):
+                    self.assertEqual(views.GenomeTrackList().get_authenticators(), [])
+                    lean_response = Client().get(url) #new client loads the middleware
+                self.assertIsNone(lean_response.wsgi_request.user) #UNAUTHENTICATED_USER
+            self.assertEqual(lean_response.status_code, 200)
+            self.assertEqual(lean_response.content, response.content)
+            self.assertEqual(lean_response["ETag"], response["ETag"])
+            self.assertNotIn("X-Frame-Options", lean_response) #clickjacking middleware not installed
+
+
+class LocalCacheTest(TestCase):
+    def test_size_bound(self):
+        lru = cache.LocalCache(max_size=2)
+        lru.set("a", b"1", 0)
+        lru.set("b", b"2", 0)
+        lru.get("a") #"b" becomes least recently used
+        lru.set("c", b"3", 0)
+        self.assertEqual(lru.get("a"), (b"1", 0))
+        self.assertEqual(lru.get("b"), (None, 0))
+        self.assertEqual(lru.get("c"), (b"3", 0))
+
+    def test_timeout(self):
+        lru = cache.LocalCache(max_size=2, timeout=-1)
+        lru.set("a", b"1", 0)
+        self.assertEqual(lru.get("a"), (None, 0))
+        with override_settings(TRACK_CACHE_BACKEND="local", TRACK_CACHE_TIMEOUT=0):
+            self.assertRaises(ImproperlyConfigured, cache.get_backend)
+
+
+class TrackCategoriesCacheTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        self.url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+        populate_genome(self.genome_id, 2, 2)
+
+    def assert_cached(self, track_count):
+        response = self.client.get(self.url)
+        self.assertEqual(sum(len(c["track_list"]) for c in response.json()["track_categories"]), track_count)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_backends(self):
+        for backend in ["local", "shared"]:
+            with self.subTest(backend=backend), override_settings(TRACK_CACHE_BACKEND=backend):
+                cache.get_backend().clear()
+                self.assert_cached(4)
+
+    @override_settings(TRACK_CACHE_BACKEND="local")
+    def test_invalidation(self):
+        self.assert_cached(4)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("tracks:track_url"), track_payload(self.genome_id, "new-track"), content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assert_cached(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("tracks:track_url", args=[response.json()["track_id"]]))
+        self.assertEqual(response.status_code, 204)
+        self.assert_cached(4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_stale_payload(self):
+        for backend in ["local", "shared"]:
+            with self.subTest(backend=backend), override_settings(TRACK_CACHE_BACKEND=backend):
+                cache.get_backend().clear()
+                _, version = cache.get_payload(self.genome_id)
+                stale_payload = payloads.genome_payload(self.genome_id)
+                # a write is committed before the payload read above is cached
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(reverse("tracks:track_url"), track_payload(self.genome_id, f"{backend}-track"), content_type="application/json")
+                cache.set_payload(self.genome_id, stale_payload, version)
+                self.assertIsNone(cache.get_payload(self.genome_id)[0])
+                response = self.client.get(self.url)
+                self.assertNotEqual(response["ETag"], stale_payload.etag)
+
+
+@override_settings(COMPRESSION_ENCODINGS=["br", "gzip"], COMPRESSION_MIN_SIZE=1024)
+class CompressionTest(TestCase):
+    def setUp(self):
+        self.genome_id = uuid.uuid4()
+        self.url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+        populate_genome(self.genome_id, 3, 5)
+        self.identity = self.client.get(self.url)
+
+    def assert_encoded(self, response, encoding):
+        decompress = {"gzip": gzip.decompress, "br": getattr(compression.brotli, "decompress", None)}
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get("Content-Encoding"), encoding)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = decompress[encoding](response.content) if encoding else response.content
+        self.assertEqual(content, self.identity.content)
+        if(encoding):
+            self.assertLess(len(response.content), len(self.identity.content))
+            self.assertEqual(response["ETag"], self.identity["ETag"])
+
+    def test_gzip(self):
+        for accept_encoding in ["gzip", "gzip, deflate", "br;q=0, gzip;q=0.5"]:
+            self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept_encoding), "gzip")
+        with override_settings(COMPRESSION_ENCODINGS=["gzip"]):
+            self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br"), "gzip")
+
+    @skipIf(compression.brotli is None, "brotli is not installed")
+    def test_br(self):
+        for accept_encoding in ["br", "gzip, deflate, br", "gzip;q=0.5, br", "*"]:
+            self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept_encoding), "br")
+
+    def test_identity(self):
+        for accept_encoding in ["", "identity", "deflate", "gzip;q=0, br;q=0"]:
+            self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept_encoding), None)
+        with override_settings(COMPRESSION_ENCODINGS=[]):
+            self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br"), None)
+        with override_settings(COMPRESSION_MIN_SIZE=len(self.identity.content) + 1):
+            self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br"), None)
+        response = self.client.get(reverse("tracks:genome_tracks_url", args=[uuid.uuid4()]), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response) #error responses
+
+    def test_not_modified(self):
+        for url in [self.url, reverse("tracks:track_url", args=[Track.objects.first().track_id])]:
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            not_modified = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertTrue(response["ETag"].startswith('W/"'))
+            self.assertEqual(not_modified["ETag"], response["ETag"])
+            self.assertEqual(not_modified["Vary"], response["Vary"])
+            self.assertIn("Accept-Encoding", not_modified["Vary"])
+        with override_settings(COMPRESSION_ENCODINGS=[]):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.identity["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertTrue(response["ETag"].startswith('"'))
+            self.assertNotIn("Accept-Encoding", response.get("Vary", ""))
+
+    @override_settings(TRACK_CACHE_BACKEND="local")
+    def test_compressed_once(self):
+        call_command("rebuild_payloads", str(self.genome_id), stdout=io.StringIO())
+        self.assertIsNotNone(GenomePayload.objects.get(genome_id=self.genome_id).body_gzip)
+        cache.get_backend().clear()
+        with mock.patch("tracks.compression.compress", wraps=compression.compress) as compress:
+            for i in range(3):
+                self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip"), "gzip")
+        compress.assert_not_called() #stored compressed variants are cached and reused
+        GenomePayload.objects.all().delete()
+        cache.get_backend().clear()
+        with mock.patch("tracks.compression.compress", wraps=compression.compress) as compress:
+            for i in range(3):
+                self.assert_encoded(self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip"), "gzip")
+        self.assertEqual(compress.call_count, len(compression.available_encodings())) #once, when cached
+
+    def test_other_responses(self):
+        url = reverse("tracks:tracks_url")
+        identity = self.client.get(url, {"genome_id": self.genome_id})
+        response = self.client.get(url, {"genome_id": self.genome_id}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+
+
+@override_settings(CACHE_CONTROL="public, max-age=60")
+class ConditionalRequestTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        populate_genome(self.genome_id, 2, 2)
+        self.track = Track.objects.filter(genome_id=self.genome_id).first()
+        self.urls = [
+            reverse("tracks:genome_tracks_url", args=[self.genome_id]),
+            reverse("tracks:track_url", args=[self.track.track_id]),
+        ]
+
+    def test_headers(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response["ETag"].startswith('W/"')) #compression enabled
+            self.assertEqual(response["Cache-Control"], "public, max-age=60")
+            self.assertEqual(self.client.get(url)["ETag"], response["ETag"])
+
+    def test_not_modified(self):
+        for url, num_queries in zip(self.urls, [2, 1]):
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(num_queries): #(stored payload lookup +) version query only
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+            self.assertEqual(response.content, b"")
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"other-etag"')
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(TRACK_CACHE_BACKEND="local")
+    def test_not_modified_from_cache(self):
+        url = self.urls[0]
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_on_update(self):
+        for url in self.urls:
+            etag = self.client.get(url)["ETag"]
+            self.track.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+        etag = self.client.get(self.urls[0])["ETag"]
+        Track.objects.exclude(pk=self.track.pk).filter(genome_id=self.genome_id).first().delete()
+        self.assertNotEqual(self.client.get(self.urls[0])["ETag"], etag)
+
+
+class ReadPayloadTest(WriteEnabledTestCase):
+    """
+    Read endpoints (values() rows + configured renderer) return the same bytes as model serializers + JSONRenderer.
+    """
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        payload = []
+        for path in sorted((settings.BASE_DIR / "templates").glob("*.yaml")):
+            track_data = yaml.safe_load(path.read_text())
+            track_data["genome_id"] = str(self.genome_id)
+            payload.append(track_data)
+        track_data = track_payload(self.genome_id, "unicode")
+        track_data["description"] = "Ünïcode – line\u2028separator"
+        track_data["settings"] = {"scale": 0.5, "range": [-1.25, 1e3], "options": {"label": None, "on": True}}
+        track_data["sources"].append({"name": "Other", "url": "https://other.org"})
+        track_data["datafile_info"] = {"regular": {"format": "bigBed", "size": 2**40, "zoom_levels": [10, 40], "bases_covered": 0, "chromosomes": ["1", "X"]}}
+        payload.append(track_data)
+        response = self.client.post(reverse("tracks:tracks_url"), payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+
+    def serializer_payload(self):
+        tracks = Track.objects.filter(genome_id=self.genome_id).select_related("category").prefetch_related("sources")
+        categories = {}
+        for track in tracks:
+            categories.setdefault(track.category_id, (track.category, []))[1].append(track)
+        track_categories = []
+        for category, track_list in categories.values():
+            category_data = CategorySerializer(category).data
+            category_data["track_list"] = CategoryTrackSerializer(track_list, many=True).data
+            track_categories.append(category_data)
+        return JSONRenderer().render({"track_categories": track_categories})
+
+    def test_track_categories(self):
+        expected = self.serializer_payload()
+        self.assertIn("\\u2028".encode(), expected)
+        for orjson in [renderers.orjson, None]:
+            with self.subTest(orjson=bool(orjson)), mock.patch.object(renderers, "orjson", orjson):
+                response = self.client.get(reverse("tracks:genome_tracks_url", args=[self.genome_id]))
+                self.assertEqual(response.content, expected)
+
+    def test_track(self):
+        for track in Track.objects.filter(genome_id=self.genome_id).prefetch_related("sources"):
+            response = self.client.get(reverse("tracks:track_url", args=[track.track_id]))
+            self.assertEqual(response.content, JSONRenderer().render(ReadTrackSerializer(track).data))
+
+    def test_datafile_info(self):
+        track = Track.objects.get(genome_id=self.genome_id, label="unicode")
+        digest = chromosome_set_digest(["1", "X"])
+        self.assertEqual(track.datafile_info, {"regular": {"format": "bigBed", "size": 2**40, "zoom_levels": [10, 40], "bases_covered": 0,
+                                                           "chromosome_set": digest, "chromosome_count": 2}})
+        track_data = track_payload(self.genome_id, "other")
+        track_data["datafile_info"] = {"regular": {"chromosomes": ["1", "X"]}, "summary": {"chromosomes": ["1"]}}
+        self.assertEqual(self.client.post(reverse("tracks:track_url"), track_data, content_type="application/json").status_code, 201)
+        response = self.client.get(reverse("tracks:chromosomes_url", args=[self.genome_id]))
+        self.assertEqual(response.json(), {"chromosome_sets": {digest: ["1", "X"], chromosome_set_digest(["1"]): ["1"]}}) #stored once per genome
+        self.assertEqual(self.client.get(reverse("tracks:chromosomes_url", args=[uuid.uuid4()])).status_code, 404)
+        track_data["datafile_info"] = {"regular": {"chromosomes": [1, 2]}}
+        self.assertEqual(self.client.post(reverse("tracks:track_url"), track_data, content_type="application/json").status_code, 400)
+
+    def test_chromosome_sets_migration(self):
+        migration = importlib.import_module("tracks.migrations.0011_chromosome_sets")
+        track = Track.objects.get(genome_id=self.genome_id, label="unicode")
+        datafile_info = {"regular": {"format": "bigBed", "chromosomes": ["1", "2", "3"]}, "summary": {}}
+        Track.objects.filter(id=track.id).update(datafile_info=datafile_info)
+        migration.move_chromosome_lists(apps, None)
+        track.refresh_from_db()
+        digest = chromosome_set_digest(["1", "2", "3"])
+        self.assertEqual(track.datafile_info, {"regular": {"format": "bigBed", "chromosome_set": digest, "chromosome_count": 3}, "summary": {}})
+        self.assertEqual(ChromosomeSet.objects.get(genome_id=self.genome_id, digest=digest).chromosomes, ["1", "2", "3"])
+        migration.inline_chromosome_lists(apps, None) #reversible
+        track.refresh_from_db()
+        self.assertEqual(track.datafile_info, datafile_info)
+
+    def test_postgres_engine(self):
+        url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+        Track.objects.filter(genome_id=self.genome_id, label="unicode").update(display_order=-1) #category order changes
+        # categories with the same lowest display_order: ordered by their first track in (display_order, id) order
+        tie_a = Category.objects.create(track_category_id="tie-a", label="Tie A")
+        tie_b = Category.objects.create(track_category_id="tie-b", label="Tie B")
+        create_track(self.genome_id, tie_a, "tie-a-1", display_order=2500)
+        create_track(self.genome_id, tie_b, "tie-b-1")
+        create_track(self.genome_id, tie_a, "tie-a-2")
+        GenomePayload.objects.filter(genome_id=self.genome_id).delete() #payload built from tracks
+        response = self.client.get(url)
+        category_ids = [category["track_category_id"] for category in response.json()["track_categories"]]
+        self.assertLess(category_ids.index("tie-b"), category_ids.index("tie-a"))
+        with override_settings(TRACK_CATEGORIES_ENGINE="postgres"):
+            with self.assertNumQueries(2): #stored payload (none), payload query
+                sql_response = self.client.get(url)
+            self.assertEqual(sql_response.status_code, 200)
+            self.assertEqual(json.loads(sql_response.content), json.loads(response.content))
+            self.assertEqual(sql_response["ETag"], response["ETag"])
+            self.assertEqual(self.client.get(reverse("tracks:genome_tracks_url", args=[uuid.uuid4()])).status_code, 404)
+
+    def test_renderer(self):
+        data = {"id": uuid.uuid4(), "value": decimal.Decimal("1.5"), 1: ["\u2029", "ä", 2.5, None, False], "empty": {},
+            "created": datetime.datetime(2024, 5, 1, 12, 30, 15, 250000, tzinfo=datetime.timezone.utc), "day": datetime.date(2024, 5, 1)}
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'"2024-05-01T12:30:15.250000Z"', renderers.FastJSONRenderer().render(data)) #DRF datetime format
+        large_int = {"settings": {"max": 2 ** 70, "min": -2 ** 64}} #wider than 64 bits: rendered by JSONRenderer
+        self.assertEqual(renderers.FastJSONRenderer().render(large_int), JSONRenderer().render(large_int))
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b"")
+        indented = renderers.FastJSONRenderer().render(data, "application/json; indent=2")
+        self.assertEqual(indented, JSONRenderer().render(data, "application/json; indent=2"))
+
+
+class GenomePayloadTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        self.url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+
+    def post(self, *labels):
+        payload = [track_payload(self.genome_id, label) for label in labels]
+        response = self.client.post(reverse("tracks:tracks_url"), payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return [result["track_id"] for result in response.json()["tracks"]]
+
+    def assert_stored(self, labels):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        tracks = [track["label"] for category in response.json()["track_categories"] for track in category["track_list"]]
+        self.assertEqual(tracks, labels)
+        return response
+
+    def test_rebuilt_on_write(self):
+        track_ids = self.post("track-0", "track-1")
+        self.assertEqual(GenomePayload.objects.get(genome_id=self.genome_id).version, 1)
+        self.assert_stored(["track-0", "track-1"])
+        self.client.post(reverse("tracks:track_url"), track_payload(self.genome_id, "track-2"), content_type="application/json")
+        self.assert_stored(["track-0", "track-1", "track-2"])
+        self.client.delete(reverse("tracks:track_url", args=[track_ids[0]]))
+        response = self.assert_stored(["track-1", "track-2"])
+        self.assertEqual(GenomePayload.objects.get(genome_id=self.genome_id).version, 3)
+        GenomePayload.objects.all().delete()
+        self.assertEqual(self.client.get(self.url).content, response.content) #same payload when built from tracks
+        self.post("track-3")
+        self.client.delete(self.url)
+        self.assertFalse(GenomePayload.objects.exists())
+
+    def test_rebuild_command(self):
+        self.post("track-0")
+        Track.objects.filter(genome_id=self.genome_id).update(label="fixed") #manual fix
+        other_genome_id = uuid.uuid4()
+        populate_genome(other_genome_id, 1, 1) #loaded outside the API
+        GenomePayload.objects.create(genome_id=uuid.uuid4(), release=releases.current_release(), body=b"{}", etag='"stale"')
+        call_command("rebuild_payloads", stdout=io.StringIO())
+        self.assert_stored(["fixed"])
+        self.assertEqual(GenomePayload.objects.get(genome_id=self.genome_id).version, 2)
+        self.assertEqual(sorted(GenomePayload.objects.values_list("genome_id", flat=True)), sorted([self.genome_id, other_genome_id]))
+
+
+class TrackListTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        self.url = reverse("tracks:tracks_url")
+
+    def post(self, payload):
+        return self.client.post(self.url, payload, content_type="application/json")
+
+    def test_bulk_create(self):
+        payload = [track_payload(self.genome_id, f"track-{i}") for i in range(3)]
+        payload[2]["trigger"] = ["track", "expand"]
+        payload[2]["sources"].append({"name": "Other", "url": "https://other.org"})
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 201)
+        track_ids = [result["track_id"] for result in response.json()["tracks"]]
+        tracks = {str(track.track_id): track for track in Track.objects.filter(genome_id=self.genome_id)}
+        self.assertEqual(sorted(tracks), sorted(track_ids))
+        expand_track = tracks[track_ids[2]]
+        self.assertEqual(expand_track.trigger, ["track", "expand", track_ids[2]])
+        self.assertEqual(expand_track.sources.count(), 2)
+        self.assertEqual(Source.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_rebuild_order(self):
+        genome_ids = sorted([str(uuid.uuid4()) for i in range(4)], reverse=True)
+        with mock.patch("tracks.payloads.rebuild") as rebuild:
+            self.assertEqual(self.post([track_payload(genome_id, "track-0") for genome_id in genome_ids]).status_code, 201)
+        self.assertEqual([str(call.args[0]) for call in rebuild.call_args_list], sorted(genome_ids)) #same lock order in concurrent writes
+
+    def test_bulk_update(self):
+        track_id = self.client.post(reverse("tracks:track_url"), track_payload(self.genome_id, "track-0"), content_type="application/json").json()["track_id"]
+        payload = [track_payload(self.genome_id, "track-0"), track_payload(self.genome_id, "track-0")]
+        payload[1]["description"] = "Updated"
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["tracks"], [{"track_id": track_id}, {"track_id": track_id}])
+        self.assertEqual(Track.objects.get(genome_id=self.genome_id).description, "Updated")
+
+    def test_item_errors(self):
+        invalid_payload = track_payload(self.genome_id, "track-1")
+        invalid_payload["type"] = "unknown"
+        response = self.post([track_payload(self.genome_id, "track-0"), invalid_payload])
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["tracks"]
+        self.assertIn("track_id", results[0])
+        self.assertIn("type", results[1]["error"])
+        self.assertEqual(self.post({"label": "not a list"}).status_code, 400)
+
+    def test_genome_tracks(self):
+        payload = [track_payload(self.genome_id, f"track-{i}") for i in range(2)]
+        payload[1]["trigger"] = ["track", "expand"]
+        self.post(payload)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"genome_id": self.genome_id})
+        self.assertEqual(response.status_code, 200)
+        tracks = response.json()["tracks"]
+        self.assertEqual([track["label"] for track in tracks], ["track-0", "track-1"])
+        self.assertEqual(tracks[1]["trigger"], ["track", "expand", tracks[1]["track_id"]])
+        for field in ["genome_id", "datafiles", "settings", "description", "additional_info"]:
+            self.assertIn(field, tracks[0])
+        self.assertEqual(tracks[0]["category"], payload[0]["category"])
+        self.assertEqual(tracks[0]["sources"], payload[0]["sources"])
+        self.assertEqual(self.client.get(self.url, {"genome_id": uuid.uuid4()}).json(), {"tracks": []})
+        self.assertEqual(self.client.get(self.url, {"genome_id": "invalid"}).status_code, 400)
+
+    def test_track_lookup(self):
+        populate_genome(self.genome_id, 2, 2)
+        track_ids = [str(track_id) for track_id in Track.objects.filter(genome_id=self.genome_id).values_list("track_id", flat=True)]
+        unknown_id = str(uuid.uuid4())
+        requested = [track_ids[2], unknown_id, track_ids[0], track_ids[2]]
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"track_ids": ",".join(requested)})
+        self.assertEqual(response.status_code, 200)
+        tracks = response.json()["tracks"]
+        self.assertEqual([track["track_id"] for track in tracks], requested)
+        self.assertEqual(tracks[1], {"track_id": unknown_id, "error": "No track found with this track id."})
+        self.assertEqual(tracks[0], self.client.get(reverse("tracks:track_url", args=[track_ids[2]])).json())
+        self.assertEqual(self.client.get(self.url, {"track_ids": "invalid"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"track_ids": ",".join(track_ids * 100)}).status_code, 400)
+
+    def test_query_count_is_constant(self):
+        for n in [2, 10, 50]:
+            payload = [track_payload(self.genome_id, f"track-{n}-{i}") for i in range(n)]
+            for i, track_data in enumerate(payload):
+                track_data["category"]["track_category_id"] = f"category-{i%3}"
+                track_data["sources"].append({"name": f"Source {i}", "url": f"https://source{i}.org"})
+            self.post(payload[:1]) #existing track gets updated
+            with self.assertNumQueries(15): #incl. 4 queries for payload rebuild and 1 for active release
+                response = self.post(payload)
+            self.assertEqual(response.status_code, 201)
+
+
+class ReleaseTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_ids = [uuid.uuid4(), uuid.uuid4()]
+        self.old_track_ids = self.post([track_payload(self.genome_ids[0], "old-track")])
+
+    def post(self, payload):
+        response = self.client.post(reverse("tracks:tracks_url"), payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return [result["track_id"] for result in response.json()["tracks"]]
+
+    def labels(self, genome_id):
+        response = self.client.get(reverse("tracks:genome_tracks_url", args=[genome_id]))
+        if(response.status_code == 404):
+            return []
+        return [track["label"] for category in response.json()["track_categories"] for track in category["track_list"]]
+
+    def test_staged_release(self):
+        payload = [dict(track_payload(genome_id, "new-track"), release="next") for genome_id in self.genome_ids]
+        self.post(payload)
+        # loaded in the background: reads still get the active release
+        self.assertEqual([self.labels(genome_id) for genome_id in self.genome_ids], [["old-track"], []])
+        response = self.client.get(reverse("tracks:tracks_url"), {"genome_id": self.genome_ids[0], "release": "next"})
+        self.assertEqual([track["label"] for track in response.json()["tracks"]], ["new-track"])
+        self.assertEqual(self.client.delete(reverse("tracks:genome_tracks_url", args=[uuid.uuid4()]) + "?release=next").status_code, 404)
+        with self.assertNumQueries(5): #release, activation time, pointer upsert (in a savepoint)
+            response = self.client.post(reverse("tracks:release_activation_url", args=["next"]))
+        self.assertEqual(response.json(), {"release": "next", "genomes": 2})
+        with self.assertNumQueries(1): #stored payload of the new release
+            self.assertEqual(self.labels(self.genome_ids[0]), ["new-track"])
+        self.assertEqual(self.labels(self.genome_ids[1]), ["new-track"])
+        # writes without a release go to the active release
+        self.post([track_payload(self.genome_ids[0], "added-track")])
+        self.assertEqual(self.labels(self.genome_ids[0]), ["new-track", "added-track"])
+        # old tracks are served by id until pruned
+        self.assertEqual(self.client.get(reverse("tracks:track_url", args=[self.old_track_ids[0]])).status_code, 200)
+        releases_response = {release["name"]: release["active_genomes"] for release in self.client.get(reverse("tracks:releases_url")).json()["releases"]}
+        self.assertEqual(releases_response, {"initial": 0, "next": 2})
+        self.assertEqual(self.client.post(reverse("tracks:release_activation_url", args=["missing"])).status_code, 404)
+
+    def test_prune(self):
+        self.post([dict(track_payload(genome_id, "new-track"), release="next") for genome_id in self.genome_ids])
+        other_genome_id = uuid.uuid4()
+        self.post([track_payload(other_genome_id, "other-track")]) #stays on the initial release
+        releases.activate(Release.objects.get(name="next"))
+        self.post([dict(track_payload(self.genome_ids[0], f"track-{i}"), release="abandoned") for i in range(5)])
+        call_command("prune_releases", "--batch-size", "2", stdout=io.StringIO())
+        self.assertEqual(self.client.get(reverse("tracks:track_url", args=[self.old_track_ids[0]])).status_code, 404)
+        self.assertEqual(self.labels(other_genome_id), ["other-track"])
+        self.assertEqual(self.labels(self.genome_ids[0]), ["new-track"])
+        self.assertEqual(Track.objects.filter(release__name="abandoned").count(), 5) #still loading
+        call_command("prune_releases", "abandoned", "initial", stdout=io.StringIO())
+        self.assertEqual(sorted(Release.objects.values_list("name", flat=True)), ["initial", "next"]) #initial: active for other genome
+        self.assertEqual(Track.objects.count(), 3)
+        with self.assertRaises(CommandError):
+            call_command("prune_releases", "missing", stdout=io.StringIO())
+
+    def test_prune_chromosome_sets(self):
+        for release, chromosomes in [("next", ["1", "2"]), ("next", ["1"]), (None, ["1", "2", "3"])]:
+            track_data = dict(track_payload(self.genome_ids[0], f"track-{len(chromosomes)}"), release=release)
+            track_data["datafile_info"] = {"regular": {"chromosomes": chromosomes}}
+            self.post([{field: value for field, value in track_data.items() if value is not None}])
+        self.assertEqual(ChromosomeSet.objects.count(), 3)
+        releases.activate(Release.objects.get(name="next"))
+        call_command("prune_releases", stdout=io.StringIO())
+        remaining = ChromosomeSet.objects.order_by("digest").values_list("digest", flat=True)
+        self.assertEqual(list(remaining), sorted([chromosome_set_digest(["1", "2"]), chromosome_set_digest(["1"])]))
+
+
+@override_settings(DATABASE_ROUTERS=["tracks.routers.ReplicaRouter"], DATABASE_REPLICA_ALIASES=["replica_1", "replica_2"],
+    MIDDLEWARE=["tracks.routers.replica_middleware"] + django_settings.MIDDLEWARE)
+class ReplicaRoutingTest(WriteEnabledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genome_id = uuid.uuid4()
+        populate_genome(self.genome_id, 2, 2)
+        self.addCleanup(routers.unreachable.clear)
+
+    def test_read_routing(self):
+        url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+        # replica reads are served by the test database (no replica connections in tests)
+        with mock.patch("tracks.routers.choose_replica", return_value="default") as choose_replica:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(choose_replica.call_count, 1) #one replica per request
+            response = self.client.post(reverse("tracks:genomes_tracks_url"), [str(self.genome_id)], content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(choose_replica.call_count, 2) #read-only POST endpoint
+            response = self.client.post(reverse("tracks:tracks_url"), [track_payload(self.genome_id, "new-track")], content_type="application/json")
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(choose_replica.call_count, 2) #reads of a write request go to the primary
+            self.assertEqual(response.cookies[routers.PIN_COOKIE]["max-age"], settings.DATABASE_REPLICA_PIN)
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(choose_replica.call_count, 2) #pinned to the primary by the cookie
+            self.client.cookies.clear()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(choose_replica.call_count, 3)
+            self.assertNotIn(routers.PIN_COOKIE, self.client.get(url).cookies)
+        self.assertEqual(routers.ReplicaRouter().db_for_read(Track), "default") #outside requests (management commands)
+
+    def test_unreachable_replica(self):
+        replicas = {"replica_1": mock.Mock(), "replica_2": mock.Mock()}
+        replicas["replica_1"].ensure_connection.side_effect = OperationalError("connection refused")
+        with mock.patch("tracks.routers.connections", replicas), mock.patch("random.shuffle"), \
+                self.assertLogs("tracks.routers", "WARNING") as logs: #replicas tried in order
+            self.assertEqual(routers.choose_replica(), "replica_2")
+            self.assertEqual(routers.choose_replica(), "replica_2")
+            self.assertEqual(replicas["replica_1"].ensure_connection.call_count, 1) #skipped until DATABASE_REPLICA_RETRY
+            replicas["replica_2"].ensure_connection.side_effect = OperationalError("connection refused")
+            self.assertEqual(routers.choose_replica(), "default")
+        self.assertEqual(len(logs.output), 2)
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        populate_genome(self.genome_id, 2, 3)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+
+    genome_id = uuid.uuid4()
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename LIKE 'tracks_%%' ORDER BY indexname")
+            return cursor.fetchall()
+
+    def test_roundtrip(self):
+        url = reverse("tracks:genome_tracks_url", args=[self.genome_id])
+        response = self.client.get(url).json()
+        tracks = list(Track.objects.order_by("id").values("id", "track_id", "label", "sources__url"))
+        indexes = self.indexes()
+        for filename in ["release.snapshot", "release.snapshot.gz"]:
+            with self.subTest(filename=filename):
+                path = f"{self.dir}/{filename}"
+                call_command("export_tracks", path, stdout=io.StringIO())
+                Track.objects.all().delete()
+                Category.objects.all().delete()
+                call_command("import_tracks", path, stdout=io.StringIO())
+                self.assertEqual(list(Track.objects.order_by("id").values("id", "track_id", "label", "sources__url")), tracks)
+                self.assertEqual(self.client.get(url).json(), response)
+                self.assertTrue(GenomePayload.objects.filter(genome_id=self.genome_id).exists())
+                self.assertEqual(self.indexes(), indexes)
+        track = create_track(self.genome_id, Category.objects.first(), "new-track") #sequences continue after imported ids
+        self.assertGreater(track.id, tracks[-1]["id"])
+
+    def test_column_mismatch(self):
+        path = f"{self.dir}/release.snapshot"
+        call_command("export_tracks", path, stdout=io.StringIO())
+        with open(path) as file:
+            content = file.read().replace('"datafile_info", ', "", 1)
+        with open(path, "w") as file:
+            file.write(content)
+        with self.assertRaisesMessage(CommandError, "Columns of tracks_track don't match"):
+            call_command("import_tracks", path, stdout=io.StringIO())
+        self.assertEqual(Track.objects.count(), 6) #rolled back
+
+
+class IndexUsageTest(TestCase):
+    """
+    Query plans of the read endpoints at realistic data volume.
+    """
+    genomes = 1000
+    tracks_per_genome = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(track_category_id="category-0", label="Category 0")
+        cls.release_ids = release_ids = [releases.current_release().id, Release.objects.create(name="next").id] #previous and active release
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO tracks_track (track_id, genome_id, release_id, category_id, label, trigger, type, datafiles, colour,
+                    on_by_default, display_order, additional_info, description, settings, datafile_info, updated)
+                SELECT gen_random_uuid(), md5(g::text)::uuid, r, %s, 'track-' || t, ARRAY['track', 'track-' || t], 'regular',
+                    jsonb_build_object('regular', 'track-' || t || '.bb'), '', false, t, '', '', '{}', '{}', now()
+                FROM generate_series(1, %s) g, generate_series(1, %s) t, unnest(%s) r
+            """, [category.id, cls.genomes, cls.tracks_per_genome, release_ids])
+            cursor.execute("ANALYZE tracks_track")
+        releases.activate(Release.objects.get(name="next"))
+        cls.genome_id = Track.objects.values_list("genome_id", flat=True).first()
+
+    def assert_index_scan(self, queryset, index_cond):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan on tracks_track", plan)
+        self.assertRegex(plan, rf"Index Cond: \(+{index_cond} = ")
+
+    def test_genome_tracks_query(self):
+        self.assert_index_scan(releases.genome_tracks(self.genome_id).select_related("category"), "genome_id")
+        self.assert_index_scan(Track.objects.filter(genome_id=self.genome_id, release_id=self.release_ids[1]).values("id"), "genome_id") #delete
+
+    def test_release_queries(self):
+        plan = releases.genome_tracks(self.genome_id).explain()
+        # active release looked up once from GenomeRelease table (InitPlan output is "$0" before Postgres 17, "(InitPlan 1).col1" since)
+        self.assertIn("InitPlan 1", plan)
+        self.assertRegex(plan, r"Index Cond: \(+genome_id = .*\(release_id = [^)]") #both columns of track_genome_release_idx
+        prune_batch = Track.objects.filter(release_id=self.release_ids[0], id__gt=0).exclude(releases.is_active()).order_by("id")
+        self.assert_index_scan(prune_batch.values("id")[:5000], "release_id")
+
+    def test_track_query(self):
+        track_id = Track.objects.filter(genome_id=self.genome_id).values_list("track_id", flat=True).first()
+        self.assert_index_scan(Track.objects.filter(track_id=track_id), "track_id")
+
+    def test_unique_track(self):
+        track = Track.objects.filter(genome_id=self.genome_id).first()
+        track.datafiles = {"details": "track-details.bb", "summary": "track-summary.bw"}
+        track.save()
+        track.pk = None
+        track.track_id = uuid.uuid4()
+        track.datafiles = {"summary": "track-summary.bw", "details": "track-details.bb"}
+        with self.assertRaisesMessage(IntegrityError, "unique_track"):
+            track.save()
@@ -1,13 +1,24 @@
 """
 URL Configuration for the Tracks Django app in Ensembl Track API endpoint
 """
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, instrumentation, views
 
 app_name = "tracks"
 
+def read_view(sync_view, async_get):
+    # async GET handler under ASGI (ASYNC_VIEWS setting), other requests go to the DRF view
+    return async_views.with_sync_view(async_get, sync_view) if settings.ASYNC_VIEWS else sync_view
+
 urlpatterns = [
-    path("track_categories/<uuid:genome_id>", views.GenomeTrackList.as_view(), name="genome_tracks_url"),
-    path("track/<uuid:track_id>", views.TrackObject.as_view(), name="track_url"),
+    path("track_categories/<uuid:genome_id>", read_view(views.GenomeTrackList.as_view(), async_views.genome_track_list), name="genome_tracks_url"),
+    path("track_categories", views.GenomeBatchList.as_view(), name="genomes_tracks_url"),
+    path("track/<uuid:track_id>", read_view(views.TrackObject.as_view(), async_views.track_object), name="track_url"),
     path("track", views.TrackObject.as_view(), name="track_url"),
+    path("tracks", read_view(views.TrackList.as_view(), async_views.track_list), name="tracks_url"),
+    path("chromosomes/<uuid:genome_id>", views.ChromosomeSetList.as_view(), name="chromosomes_url"),
+    path("releases", views.ReleaseList.as_view(), name="releases_url"),
+    path("release/<str:name>/activate", views.ReleaseActivation.as_view(), name="release_activation_url"),
+    path("metrics", instrumentation.metrics, name="metrics_url"),
 ]
\ No newline at end of file
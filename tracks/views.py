@@ -1,10 +1,24 @@
-from tracks.models import Track, Category
-from tracks.serializers import ReadTrackSerializer, WriteTrackSerializer, CategorySerializer, CategoryTrackSerializer
+from tracks.models import ChromosomeSet, Release, Track
+from tracks.serializers import WriteTrackSerializer, FullTrackSerializer
+from tracks import cache, compression, etags, payloads, releases
+from tracks.renderers import render_json
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Subquery
+from django.http import HttpResponse
 from ensembl_track_api import settings
+import uuid
+
+
+def release_param(request, genome_id):
+    """
+    Release of a genome request (id subquery): release named in "release" query parameter, or the active release of the genome.
+    """
+    if("release" in request.query_params):
+        return Subquery(Release.objects.filter(name=request.query_params["release"]).values("id"))
+    return releases.active_release(genome_id)
 
 
 class GenomeTrackList(APIView):
@@ -14,25 +28,67 @@ class GenomeTrackList(APIView):
     http_method_names = settings.ALLOWED_METHODS
 
     def get(self, request, genome_id):
-        tracks = Track.objects.filter(genome_id=genome_id)
-        if(not tracks.exists()):
-            return Response({"error": "No tracks found for this genome."}, status=status.HTTP_404_NOT_FOUND)
-        categories = {}
-        for track in tracks: #group tracks by category
-            if(track.category_id not in categories):
-                category_obj = Category.objects.get(id=track.category_id)
-                categories[track.category_id] = CategorySerializer(category_obj).data
-                categories[track.category_id]["track_list"] = []
-            categories[track.category_id]["track_list"].append(CategoryTrackSerializer(track).data)
-        return Response({"track_categories": [categories[category_id] for category_id in categories]}, status=status.HTTP_200_OK)
+        payload, version = cache.get_payload(genome_id)
+        if(payload is None):
+            payload = payloads.get_stored_payload(genome_id)
+            if(payload is None): #not stored (e.g. tracks loaded outside the API): build from tracks
+                if(etags.is_conditional(request)): #revalidate with a version query before loading the tracks
+                    etag = etags.query_genome_etag(genome_id)
+                    if(etag and etags.etag_matches(request, etag)):
+                        return etags.not_modified(etag)
+                payload = payloads.genome_payload(genome_id)
+                if(payload is None):
+                    return Response({"error": "No tracks found for this genome."}, status=status.HTTP_404_NOT_FOUND)
+            payload = cache.set_payload(genome_id, payload, version)
+        if(etags.etag_matches(request, payload.etag)):
+            return etags.not_modified(payload.etag)
+        response = etags.add_cache_headers(HttpResponse(payload.body, content_type="application/json"), payload.etag)
+        return compression.payload_response(request, response, payload)
     
     def delete(self, request, genome_id):
-        tracks = Track.objects.filter(genome_id=genome_id)
-        if(not tracks.exists()):
+        tracks = Track.objects.filter(genome_id=genome_id, release_id=release_param(request, genome_id))
+        release_id = tracks.values_list("release_id", flat=True).first()
+        if(release_id is None):
             return Response({"error": "No tracks found for this genome."}, status=status.HTTP_404_NOT_FOUND)
-        tracks.delete()
+        with transaction.atomic():
+            tracks.delete()
+            payloads.rebuild(genome_id, release_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class GenomeBatchList(APIView):
+    """
+    Retrieve track categories for many genomes at once (same payload per genome as in GenomeTrackList).
+    Genome uuids are given in "genome_ids" query parameter (comma-separated) or POST payload (list).
+    """
+    http_method_names = ["get", "post"] #read-only endpoint (POST for long lists of genome uuids)
+    replica_reads = True #POST requests are served from read replicas too (see routers.py)
+    max_genomes = 1000
+
+    def get(self, request):
+        genome_ids = request.query_params.get("genome_ids", "")
+        return self.batch_response(genome_ids.split(",") if genome_ids else [])
+
+    def post(self, request):
+        genome_ids = request.data.get("genome_ids") if isinstance(request.data, dict) else request.data
+        if(not isinstance(genome_ids, list)):
+            return Response({"error": "Payload validation failed: expected a list of genome ids."}, status=status.HTTP_400_BAD_REQUEST)
+        return self.batch_response(genome_ids)
+
+    def batch_response(self, genome_ids):
+        try:
+            genome_ids = list(dict.fromkeys(str(uuid.UUID(str(genome_id).strip())) for genome_id in genome_ids))
+        except ValueError:
+            return Response({"error": "Invalid genome id in genome_ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if(not genome_ids or len(genome_ids) > self.max_genomes):
+            return Response({"error": f"Expected 1-{self.max_genomes} genome ids."}, status=status.HTTP_400_BAD_REQUEST)
+        genome_payloads = payloads.get_genome_payloads(genome_ids)
+        missing = [genome_id for genome_id in genome_ids if genome_id not in genome_payloads]
+        # rendered (cached/stored) payloads are spliced into the response as-is
+        genomes = b",".join(b'"%s":%s' % (genome_id.encode(), genome_payloads[genome_id].body)
+            for genome_id in genome_ids if genome_id in genome_payloads)
+        body = b'{"genomes":{%s},"missing":%s}' % (genomes, render_json(missing))
+        return HttpResponse(body, content_type="application/json")
+
 class TrackObject(APIView):
     """
     Retrieve or create a single track object.
@@ -40,12 +96,14 @@ class TrackObject(APIView):
     http_method_names = settings.ALLOWED_METHODS
     
     def get(self, request, track_id):
-        try:
-            track = Track.objects.get(track_id=track_id)
-        except Track.DoesNotExist:
+        if(etags.is_conditional(request)):
+            etag = etags.query_track_etag(track_id)
+            if(etag and etags.etag_matches(request, etag)):
+                return etags.not_modified(etag)
+        rows = payloads.get_track_rows(Track.objects.filter(track_id=track_id), payloads.READ_TRACK_FIELDS)
+        if(not rows):
             return Response({"error": "No track found with this track id."}, status=status.HTTP_404_NOT_FOUND)
-        serializer = ReadTrackSerializer(track)
-        return Response(serializer.data)
+        return etags.add_cache_headers(Response(payloads.track_payload(rows[0])), etags.track_etag(track_id, rows[0]["updated"]))
     
     def post(self, request):
         serializer = WriteTrackSerializer(data=request.data)
@@ -62,5 +120,98 @@ class TrackObject(APIView):
             track = Track.objects.get(track_id=track_id)
         except Track.DoesNotExist:
             return Response({"error": "No track found with this track id."}, status=status.HTTP_404_NOT_FOUND)
-        track.delete()
+        with transaction.atomic():
+            track.delete()
+            payloads.rebuild(track.genome_id, track.release_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+class TrackList(APIView):
+    """
+    Retrieve full track records for a genome (used for incremental updates) or a list of tracks by id
+    (same payload as in TrackObject), or create tracks in bulk (list of track payloads, same format as in TrackObject).
+    """
+    http_method_names = settings.ALLOWED_METHODS
+    max_tracks = 200
+
+    def get(self, request):
+        if("track_ids" in request.query_params):
+            return self.get_tracks(request.query_params["track_ids"])
+        try:
+            genome_id = uuid.UUID(request.query_params.get("genome_id", ""))
+        except ValueError:
+            return Response({"error": "Missing or invalid genome_id parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        tracks = Track.objects.filter(genome_id=genome_id, release_id=release_param(request, genome_id))
+        tracks = tracks.select_related("category").prefetch_related("sources")
+        return Response({"tracks": FullTrackSerializer(tracks, many=True).data})
+
+    def get_tracks(self, track_ids):
+        try:
+            track_ids = [str(uuid.UUID(track_id.strip())) for track_id in track_ids.split(",")]
+        except ValueError:
+            return Response({"error": "Invalid track id in track_ids parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        if(len(track_ids) > self.max_tracks):
+            return Response({"error": f"Expected up to {self.max_tracks} track ids."}, status=status.HTTP_400_BAD_REQUEST)
+        rows = payloads.get_track_rows(Track.objects.filter(track_id__in=track_ids), payloads.READ_TRACK_FIELDS)
+        tracks = {row["track_id"]: payloads.track_payload(row) for row in rows}
+        results = [tracks.get(track_id, {"track_id": track_id, "error": "No track found with this track id."}) for track_id in track_ids]
+        return Response({"tracks": results})
+
+    def post(self, request):
+        if(not isinstance(request.data, list)):
+            return Response({"error": "Payload validation failed: expected a list of tracks."}, status=status.HTTP_400_BAD_REQUEST)
+        track_serializers = [WriteTrackSerializer(data=track_data) for track_data in request.data]
+        valid_serializers = [serializer for serializer in track_serializers if serializer.is_valid()]
+        try:
+            tracks = iter(WriteTrackSerializer(many=True).create([serializer.validated_data for serializer in valid_serializers]))
+        except IntegrityError as e:
+            return Response({"error": f"Track already exists: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        results = []
+        for serializer in track_serializers:
+            if(serializer.errors):
+                results.append({"error": f"Payload validation failed: {serializer.errors}"})
+                continue
+            track = next(tracks)
+            results.append({"track_id": track.track_id} if isinstance(track, Track) else {"error": track})
+        created = sum("track_id" in result for result in results)
+        if(created == len(results)):
+            response_status = status.HTTP_201_CREATED
+        elif(created):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"tracks": results}, status=response_status)
+
+class ChromosomeSetList(APIView):
+    """
+    Retrieve the chromosome sets of a genome (chromosome names in its datafiles, referenced by digest from track datafile info).
+    """
+    http_method_names = ["get"]
+
+    def get(self, request, genome_id):
+        chromosome_sets = dict(ChromosomeSet.objects.filter(genome_id=genome_id).order_by("id").values_list("digest", "chromosomes"))
+        if(not chromosome_sets):
+            return Response({"error": "No chromosome sets found for this genome."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"chromosome_sets": chromosome_sets})
+
+class ReleaseList(APIView):
+    """
+    List track releases with the nr of genomes they are active for.
+    """
+    http_method_names = ["get"]
+
+    def get(self, request):
+        release_list = Release.objects.annotate(active_genomes=Count("genomes")).values("name", "created", "activated", "active_genomes")
+        return Response({"releases": list(release_list)})
+
+class ReleaseActivation(APIView):
+    """
+    Make a release live for all genomes that have tracks in it (see releases.activate).
+    """
+    http_method_names = settings.ALLOWED_METHODS
+
+    def post(self, request, name):
+        try:
+            release = Release.objects.get(name=name)
+        except Release.DoesNotExist:
+            return Response({"error": "No release found with this name."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"release": release.name, "genomes": releases.activate(release)})
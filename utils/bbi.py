@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Header reader for bigBed/bigWig (BBI) track datafiles. Reads the file header,
+zoom level headers, chromosome B+ tree and total summary through a read-only
+memory map, so only the pages holding these structures are fetched from disk
+(no matter the file size). Used by submit_tracks.py to validate datafiles and
+attach their metadata to track payloads. Run as a script to print the manifest
+of a genome data directory:
+  ./bbi.py /path/to/genome_dir
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable
+from typing_extensions import TypedDict
+
+FORMATS = {0x8789F2EB: "bigBed", 0x888FFC26: "bigWig"}
+CHROM_TREE_MAGIC = 0x78CA8C91
+HEADER_SIZE = 64
+ZOOM_HEADER_SIZE = 24
+
+
+class DatafileInfo(TypedDict):
+    format: str
+    size: int
+    zoom_levels: list[int]
+    bases_covered: int
+    chromosomes: list[str]
+
+
+class InvalidDatafile(Exception):
+    """Raised for files that are not valid bigBed/bigWig files."""
+
+
+def read_chromosomes(data: mmap.mmap, offset: int, endian: str) -> list[str]:
+    """Chromosome names from the chromosome B+ tree (in key order)."""
+    magic, block_size, key_size, value_size, item_count = struct.unpack_from(f"{endian}IIIIQ", data, offset)
+    if magic != CHROM_TREE_MAGIC:
+        raise InvalidDatafile("bad chromosome tree magic")
+    chromosomes = []
+    nodes = [offset + 32]
+    visited = set()
+    while nodes:
+        node = nodes.pop()
+        if node in visited:
+            raise InvalidDatafile("chromosome tree has a cycle")
+        visited.add(node)
+        is_leaf, count = struct.unpack_from(f"{endian}BxH", data, node)
+        item = node + 4
+        if item + count * (key_size + (value_size if is_leaf else 8)) > len(data):
+            raise InvalidDatafile("chromosome tree is truncated")
+        children = []
+        for i in range(count):
+            key = data[item : item + key_size]
+            if is_leaf:
+                chromosomes.append(key.rstrip(b"\0").decode())
+                item += key_size + value_size
+            else:
+                children.append(struct.unpack_from(f"{endian}Q", data, item + key_size)[0])
+                item += key_size + 8
+        nodes += reversed(children)  # depth-first, in key order
+    if len(chromosomes) != item_count:
+        raise InvalidDatafile("chromosome tree is incomplete")
+    return chromosomes
+
+
+def read_header(path: str) -> DatafileInfo:
+    """Reads the metadata of a bigBed/bigWig file. Raises InvalidDatafile (or OSError for unreadable files)."""
+    with open(path, "rb") as datafile:
+        size = os.fstat(datafile.fileno()).st_size
+        if size < HEADER_SIZE:
+            raise InvalidDatafile("file is too small")
+        with mmap.mmap(datafile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                for endian in "<>":
+                    file_format = FORMATS.get(struct.unpack_from(f"{endian}I", data)[0])
+                    if file_format:
+                        break
+                else:
+                    raise InvalidDatafile("not a bigBed/bigWig file")
+                (version, zoom_count, chrom_tree_offset, data_offset, index_offset, field_count, defined_field_count,
+                    autosql_offset, summary_offset) = struct.unpack_from(f"{endian}HHQQQHHQQ", data, 4)
+                if max(chrom_tree_offset, data_offset, index_offset) > size:
+                    raise InvalidDatafile("file is truncated")
+                zoom_levels = [
+                    struct.unpack_from(f"{endian}I", data, HEADER_SIZE + i * ZOOM_HEADER_SIZE)[0] for i in range(zoom_count)
+                ]
+                bases_covered = struct.unpack_from(f"{endian}Q", data, summary_offset)[0] if summary_offset else 0
+                chromosomes = read_chromosomes(data, chrom_tree_offset, endian)
+            except (struct.error, ValueError) as e:  # offsets past the end of the file, undecodable names
+                raise InvalidDatafile(f"corrupted header ({e})")
+    return {
+        "format": file_format,
+        "size": size,
+        "zoom_levels": zoom_levels,
+        "bases_covered": bases_covered,
+        "chromosomes": chromosomes,
+    }
+
+
+def build_manifest(genome_dir: str, filenames: Iterable[str], workers: int = 8) -> tuple[dict[str, DatafileInfo], dict[str, str]]:
+    """
+    Reads the headers of datafiles in a genome directory in a pool of threads (in the calling thread if `workers` is 1).
+    Returns the manifest (filename => datafile info) and the errors (filename => message) for invalid files.
+    """
+    def read(filename):
+        try:
+            return filename, read_header(f"{genome_dir}/{filename}"), ""
+        except (InvalidDatafile, OSError) as e:
+            return filename, None, str(e)
+
+    def collect(results):
+        manifest = {}
+        errors = {}
+        for filename, info, error in results:
+            if info:
+                manifest[filename] = info
+            else:
+                errors[filename] = error
+        return manifest, errors
+
+    if workers == 1:
+        return collect(map(read, filenames))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return collect(executor.map(read, filenames))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(f"Usage: {sys.argv[0]} GENOME_DIR")
+    genome_dir = sys.argv[1]
+    filenames = sorted(name for name in os.listdir(genome_dir) if name.endswith(".bb") or name.endswith(".bw"))
+    manifest, errors = build_manifest(genome_dir, filenames)
+    print(json.dumps({"files": manifest, "errors": errors}, indent=2))
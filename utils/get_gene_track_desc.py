@@ -13,8 +13,12 @@ USE AT YOUR OWN RISK!
 Author: Stefano Giorgetti
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+import json
+import os
 from string import Template
+from typing import Callable
 from mysql.connector.connection import MySQLConnection
 
 # CHECK cfg below with Automation!!!
@@ -25,6 +29,8 @@ META_DB = "ensembl_genome_metadata"
 HOST = "mysql-ens-sta-6.ebi.ac.uk"
 PORT = 4695
 
+CHUNK_SIZE = 50  # nr of core DBs queried in a single round-trip
+
 @dataclass
 class SrcInfo:
     """Class for keeping track of geneset source info"""
@@ -102,25 +108,89 @@ def get_analysis_src_info(conx:MySQLConnection, dbname:str) -> SrcInfo:
     return SrcInfo(source_name=r[2], source_url=r[3], is_ensembl_anno=is_ensembl_anno)
 
 
-def main(release:int, genomes:list[str]|None=None) -> dict[str, dict]:
-    conx = get_metadb_connection()
-    dbs = get_dbs(conx, release=release, genomes=genomes)
-    conx.close()
-    conx = get_ensro_connection()
-    descriptions = {}
-
-    print(f"Found {len(dbs)} genomes{f' (out of {len(genomes)} requested)' if genomes else ''} for release {release}.")
-    for db in dbs:
-        dbname = db[2]
-        #print(f"Working on: {dbname}")
-        src_info = get_analysis_src_info(conx, dbname)
-        ensembl_imported = "Annotated" if src_info.is_ensembl_anno else "Imported"
-        descriptions[db[1]] = {
-            "source_names": [src_info.source_name],
-            "source_urls": [src_info.source_url],
-            "description": ensembl_imported,
-        }
+def get_analysis_src_info_batch(conx, dbnames:list[str]) -> dict[str, SrcInfo]:
+    """Same as get_analysis_src_info, for many core DBs in a single query."""
+    cursor = conx.cursor()
 
-    conx.close()
+    t = Template(
+        """select '$dbname', species_id,
+           max(case when meta_key = 'genebuild.annotation_source' then meta_value else null end),
+           max(case when meta_key = 'genebuild.provider_name' then meta_value else null end),
+           max(case when meta_key = 'genebuild.provider_url' then meta_value else null end)
+           from $dbname.meta m
+           where m.meta_key in ('genebuild.annotation_source','genebuild.provider_name','genebuild.provider_url')
+           group by species_id
+        """
+    )
 
+    cursor.execute(" union all ".join(t.substitute(dbname=dbname) for dbname in dbnames))
+    src_info = {}
+    for r in sorted(cursor.fetchall(), key=lambda r: (r[0], r[1])):
+        if r[0] in src_info: # first species in multi-species DBs
+            continue
+        is_ensembl_anno = str(r[2]).lower() == "ensembl"
+        src_info[r[0]] = SrcInfo(source_name=r[3], source_url=r[4], is_ensembl_anno=is_ensembl_anno)
+    return src_info
+
+
+def fetch_src_info(dbnames:list[str], connect:Callable=get_ensro_connection, chunk_size:int=CHUNK_SIZE, workers:int=1) -> dict[str, SrcInfo]:
+    """Fetch geneset source info for core DBs in chunks, spread over `workers` connections."""
+    chunks = [dbnames[i:i+chunk_size] for i in range(0, len(dbnames), chunk_size)]
+
+    def fetch_chunks(chunks:list[list[str]]) -> dict[str, SrcInfo]:
+        conx = connect()
+        try:
+            return {dbname: info for chunk in chunks for dbname, info in get_analysis_src_info_batch(conx, chunk).items()}
+        finally:
+            conx.close()
+
+    workers = max(1, min(workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(fetch_chunks, [chunks[i::workers] for i in range(workers)])
+    return {dbname: info for result in results for dbname, info in result.items()}
+
+
+def load_cache(cache_dir:str, release:int) -> dict:
+    try:
+        with open(os.path.join(cache_dir, f"gene_desc_release_{release}.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"complete": False, "descriptions": {}}
+
+
+def save_cache(cache_dir:str, release:int, cache:dict) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, f"gene_desc_release_{release}.json"), "w") as f:
+        json.dump(cache, f)
+
+
+def main(release:int, genomes:list[str]|None=None, cache_dir:str="", workers:int=1) -> dict[str, dict]:
+    """
+    Returns gene track descriptions for the genomes in a release (keyed by genome UUID).
+    With `cache_dir`, results are kept in a file per release and only missing genomes are looked up.
+    """
+    cache = load_cache(cache_dir, release) if cache_dir else {"complete": False, "descriptions": {}}
+    descriptions = cache["descriptions"]
+    missing_genomes = [genome for genome in genomes if genome not in descriptions] if genomes else None
+    lookup = not cache["complete"] and (not genomes or missing_genomes)
+
+    if lookup:
+        conx = get_metadb_connection()
+        dbs = get_dbs(conx, release=release, genomes=missing_genomes)
+        conx.close()
+        src_info = fetch_src_info([db[2] for db in dbs], connect=get_ensro_connection, workers=workers)
+        for db in dbs:
+            ensembl_imported = "Annotated" if src_info[db[2]].is_ensembl_anno else "Imported"
+            descriptions[db[1]] = {
+                "source_names": [src_info[db[2]].source_name],
+                "source_urls": [src_info[db[2]].source_url],
+                "description": ensembl_imported,
+            }
+        if cache_dir:
+            cache["complete"] = cache["complete"] or not genomes
+            save_cache(cache_dir, release, cache)
+
+    if genomes:
+        descriptions = {genome: descriptions[genome] for genome in genomes if genome in descriptions}
+    print(f"Found {len(descriptions)} genomes{f' (out of {len(genomes)} requested)' if genomes else ''} for release {release}{'' if lookup else ' (cached)'}.")
     return descriptions
@@ -8,15 +8,25 @@ Only required parameter is release nr. See below for additional options.
 """
 
 import argparse
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import csv
 import glob
+import hashlib
+import json
 import os.path
+import pickle
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+from typing import Callable, Iterable, Iterator
 from typing_extensions import NotRequired, TypedDict
 from uuid import UUID
 import yaml
 
 from get_gene_track_desc import main  as get_gene_desc
+from bbi import DatafileInfo, build_manifest
 
 # Datamodel for track payloads
 class TrackData(TypedDict):
@@ -29,6 +39,8 @@ class TrackData(TypedDict):
     on_by_default: bool
     settings: NotRequired[dict]
     sources: NotRequired[list[dict]]
+    datafile_info: NotRequired[dict[str, DatafileInfo]]
+    release: NotRequired[str]
     trigger: list[str]
     type: str
 
@@ -42,6 +54,64 @@ class DescData(TypedDict):
 Descriptions = dict[str, DescData]
 DescCollection = dict[str, Descriptions]
 
+# Datafile headers of a genome: filename => datafile info, filename => error message (invalid files)
+Manifest = tuple[dict[str, DatafileInfo], dict[str, str]]
+
+# Track templates, parsed once and matched to datafile names with a prefix index
+class TemplateIndex:
+    """
+    Validated track templates (keyed by template name) stored as immutable pickled snapshots.
+    `get` hands out a fresh deep copy of a template, `match` finds the templates for a datafile.
+    """
+
+    required_fields = sorted(TrackData.__required_keys__)
+
+    def __init__(self, templates: dict[str, bytes]):
+        self.templates = templates
+        self.names = sorted(templates)
+
+    @classmethod
+    def load(cls, path: str, ext: str) -> "TemplateIndex":
+        templates = {}
+        for filepath in glob.glob(f"{path}/*{ext}"):
+            with open(filepath, "r") as template_file:
+                track_data = yaml.safe_load(template_file)
+            missing_fields = [key for key in cls.required_fields if key not in track_data]
+            if missing_fields:
+                raise ValueError(f"Template {filepath} is missing fields: {', '.join(missing_fields)}")
+            templates[os.path.basename(filepath)[: -len(ext)]] = pickle.dumps(track_data)
+        return cls(templates)
+
+    def filter(self, prefixes: list[str]) -> "TemplateIndex":
+        return TemplateIndex({
+            name: template for name, template in self.templates.items()
+            if any(name.startswith(prefix) for prefix in prefixes)
+        })
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.templates
+
+    def get(self, name: str) -> TrackData:
+        return pickle.loads(self.templates[name])
+
+    def match(self, filename: str) -> list[tuple[str, bool]]:
+        """
+        Matches a datafile name (without extension) to template names (see `match_template`).
+        Returns a list of (template name, fallback match) tuples.
+        """
+        if filename in self.templates:  # exact match
+            return [(filename, False)]
+        for end in range(1, len(filename)):  # datafile starts with template name (shortest match)
+            if filename[:end] in self.templates:
+                return [(filename[:end], True)]
+        matches = []  # templates starting with datafile name
+        for name in self.names[bisect_left(self.names, filename) :]:
+            if not name.startswith(filename):
+                break
+            matches.append((name, False))
+        return matches
+
+
 # Global variables / constants
 dir_root = "/nfs/public/ro/enswbsites_codon/newsite"
 dir_tail = "genome_browser/8"
@@ -64,17 +134,25 @@ args = argparse.Namespace()
 template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
 VARIANT_CSV_FILE = f"{template_dir}/variant-track-desc.csv"
 EXT = ".yaml"
-templates = [
-    os.path.basename(f).replace(EXT, "") for f in glob.glob(f"{template_dir}/*{EXT}")
-]
+templates = TemplateIndex.load(template_dir, EXT)
 data_dir = ""
 track_api_url = ""
 metadata: DescCollection = {"gene":{}, "variant":{}}
 logfile = None
+session = requests.Session()  # shared keep-alive connections to Track API
+thread_data = threading.local()  # per-genome log buffer in worker threads
+stop_event = threading.Event()  # set when a worker thread fails
+
+
+class SubmissionError(Exception):
+    """Raised by `fail` in worker threads (handled in the main thread)."""
 
 
 # Helper functions
 def fail(msg):
+    if threading.current_thread() is not threading.main_thread():
+        stop_event.set()
+        raise SubmissionError(msg)
     if msg:
         print(msg)
     if logfile:
@@ -103,6 +181,9 @@ Examples:
   - Submit all tracks for release beta-5 to dev: {prog} --release 5
   - Resubmit all tracks for dog and pig: {prog} -r 5 -o -g 2284d28a-2cf7-41f0-bed6-0982601f7888 a7335667-93e7-11ec-a39d-005056b38ce3
   - Submit gene tracks for dog (data dir not used): {prog} -r 5 -t transcripts -g 2284d28a-2cf7-41f0-bed6-0982601f7888
+  - Submit all tracks, 8 genomes at a time: {prog} -r 5 -w 8
+  - Update tracks in place (only submit the changes): {prog} -r 5 -s
+  - Load all tracks in the background, then make them live at once: {prog} -r 5 --stage beta-5
   """,
     )
     parser.add_argument(
@@ -166,12 +247,50 @@ Examples:
         default="track_submission.log",
         help="log progress to a file (use '' for no logfile, default: %(default)s)",
     )
+    parser.add_argument(
+        "-m",
+        "--metadata-cache",
+        metavar="DIRNAME",
+        default="track_metadata_cache",
+        help="reuse gene track metadata fetched in previous runs (use '' to disable, default: %(default)s)",
+    )
     parser.add_argument(
         "-o", "--overwrite", action="store_true", help="overwrite (all) existing tracks"
     )
+    parser.add_argument(
+        "-s",
+        "--sync",
+        action="store_true",
+        help="only submit the changes to existing tracks (incremental update)",
+    )
     parser.add_argument(
         "-q", "--quiet", action="store_true", help="suppress status messages"
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        metavar="N",
+        type=int,
+        default=1,
+        help="nr of genomes submitted in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--scan-workers",
+        metavar="N",
+        type=int,
+        default=8,
+        help="nr of genome directories listed (and datafile headers read) in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stage",
+        metavar="NAME",
+        help="load the tracks into a new Track API release, made live for all loaded genomes once the load is complete",
+    )
+    parser.add_argument(
+        "--no-headers",
+        action="store_true",
+        help="do not read datafile headers (no datafile validation or datafile info in track payloads)",
+    )
 
     parser.parse_args(namespace=args)
     if not args.release:
@@ -182,10 +301,23 @@ Examples:
     data_dir = os.getenv("TRACK_DATA_DIR", ENV[args.env]["data_dir"])
     if args.templates:
         args.templates = [t.replace(EXT, "") for t in args.templates]
+    if args.workers < 1 or args.scan_workers < 1:
+        fail("Error: --workers and --scan-workers must be positive numbers.")
+    if args.sync and args.overwrite:
+        fail("Error: --sync and --overwrite options are mutually exclusive.")
+    if args.stage and (args.dry_run or not track_api_url):
+        fail("Error: --stage option needs a Track API endpoint (not available in dry-run mode).")
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
 
 
 # Print messages in verbose mode
 def log(msg: object) -> None:
+    buffer = getattr(thread_data, "buffer", None)
+    if buffer is not None:  # worker thread: printed by the main thread once the genome is done
+        buffer.append(msg)
+        return
     if not args.quiet:
         print(msg)
     if logfile:
@@ -217,20 +349,35 @@ def process_data_dir() -> None:
     """
     Processes the track datafiles direcotry to compose a list of tracks to be submitted for each genome.
     Datadir is expected to have subdirectories named after genome UUIDs, containing track datafiles.
-    Forwards the list of genomes and datafiles to the `match_template` function for further processing.
+    Genome directories are listed in parallel (`--scan-workers`) and forwarded to the `process_genome`
+    function as soon as they are listed, so submission starts before the whole data directory is scanned.
     """
 
     if not os.path.isdir(data_dir):
         fail(f"Error: data directory {data_dir} not found")
-    subdirs = os.listdir(data_dir)
-    i = 0
-    total = len(args.genomes or subdirs)
+    with os.scandir(data_dir) as it:
+        # is_dir() uses the file type from the directory listing (no extra stat call per entry)
+        entries = [(entry.name, entry.is_dir()) for entry in it]
     if args.genomes:
+        subdirs = {name for name, _ in entries}
         missing_genomes = [genome for genome in args.genomes if genome not in subdirs]
         if missing_genomes:
             fail(f"Error: Genome(s) missing in data directory: {', '.join(missing_genomes)}")
-    for subdir in subdirs:
-        if not os.path.isdir(f"{data_dir}/{subdir}"):
+    # genomes are selected (and skipped genomes logged) up front, so the messages don't interleave with the output of --workers
+    genomes = list(select_genomes(entries))
+    run_genome_jobs(scan_genomes(genomes))
+
+
+def select_genomes(entries: list[tuple[str, bool]]) -> Iterator[tuple[str, str]]:
+    """
+    Filters data directory entries (name, is directory) to genome directories to be processed.
+    Yields (genome ID, progress) tuples.
+    """
+
+    i = 0
+    total = len(args.genomes or entries)
+    for subdir, is_dir in entries:
+        if not is_dir:
             continue
         try:
             UUID(subdir, version=4)
@@ -246,29 +393,54 @@ def process_data_dir() -> None:
                 continue
             else:
                 args.resume = None
-        log(f"Processing genome {subdir} ({i}/{total})")
-        if args.overwrite:  # delete existing tracks first
-            # Note: removes all tracks linked to the genome
-            delete_tracks(subdir)
-        for file in os.listdir(f"{data_dir}/{subdir}"):
-            if file.endswith(".bb") or file.endswith(".bw"):
-                match_template(subdir, file)
+        yield subdir, f"{i}/{total}"
+
+
+def list_datafiles(path: str) -> list[str]:
+    with os.scandir(path) as it:
+        return [entry.name for entry in it if entry.name.endswith(".bb") or entry.name.endswith(".bw")]
+
+
+def scan_genome_dir(path: str) -> tuple[list[str], Manifest | None]:
+    """Lists the datafiles in a genome directory and reads their headers (unless `--no-headers`)."""
+    datafiles = list_datafiles(path)
+    if args.no_headers:
+        return datafiles, None
+    # headers are read in the scan thread: genomes are already scanned in parallel (--scan-workers threads in total)
+    return datafiles, build_manifest(path, datafiles, workers=1)
+
+
+def scan_genomes(genomes: Iterable[tuple[str, str]]) -> Iterator[tuple[str, str, list[str], Manifest | None]]:
+    """
+    Scans genome directories (see `scan_genome_dir`) in a pool of `--scan-workers` threads.
+    Yields `process_genome` jobs (genome ID, progress, datafiles, manifest) in input order, as soon as each directory is scanned.
+    """
+
+    with ThreadPoolExecutor(max_workers=args.scan_workers) as executor:
+        pending = deque()
+        for genome_id, progress in genomes:
+            pending.append((genome_id, progress, executor.submit(scan_genome_dir, f"{data_dir}/{genome_id}")))
+            if len(pending) >= 2 * args.scan_workers:  # keep a bounded read-ahead
+                genome_id, progress, scan = pending.popleft()
+                yield genome_id, progress, *scan.result()
+        while pending:
+            genome_id, progress, scan = pending.popleft()
+            yield genome_id, progress, *scan.result()
 
 
 # 1) Option B: use the list of tracks from command-line args
 def process_track_list() -> None:
     """
     Processes a list of genomes, track tempaltes and/or datafiles to generate track payloads.
-    Forwards the list of genomes and track templates to the `match_template` function for further processing.
+    Forwards the list of genomes and track templates to the `process_genome` function for further processing.
     """
 
     global templates
     if args.templates:
-        templates = [
-            t for t in templates if any(t.startswith(i) for i in args.templates)
-        ]
+        templates = templates.filter(args.templates)
     files = args.templates or args.files
     total = len(args.genomes)
+    jobs = []
     for i, genome_id in enumerate(args.genomes):
         if args.resume:
             if genome_id != args.resume:
@@ -276,18 +448,88 @@ def process_track_list() -> None:
                 continue
             else:
                 args.resume = None
-        log(f"Processing genome {genome_id} ({i+1}/{total})")
-        if args.overwrite:  # delete existing tracks first
-            delete_tracks(genome_id)
-        for filename in files:
-            match_template(genome_id, filename)
+        jobs.append((genome_id, f"{i+1}/{total}", files))
+    run_genome_jobs(jobs)
+
+
+# 1b) Submit the tracks for each genome (in parallel with --workers)
+def process_genome(genome_id: str, progress: str, files: list[str], manifest: Manifest | None = None) -> None:
+    """
+    Forwards the datafiles of a genome to the `match_template` function and submits the resulting track payloads.
+    Args:
+        genome_id (str): UUID of the genome to be processed.
+        progress (str): Progress indicator for log messages.
+        files (list[str]): Datafile/template names (datafiles in the genome data directory, or from cli args).
+        manifest (Manifest, optional): Datafile headers of the genome (added to the track payloads).
+    """
+
+    log(f"Processing genome {genome_id} ({progress})")
+    if args.overwrite:  # delete existing tracks first
+        # Note: removes all tracks linked to the genome
+        delete_tracks(genome_id)
+    payloads = [track_data for file in files for track_data in match_template(genome_id, file)]
+    if manifest is not None:
+        add_datafile_info(payloads, manifest)
+    if args.stage:
+        for track_data in payloads:
+            track_data["release"] = args.stage
+    if args.sync:
+        sync_tracks(genome_id, payloads)
+        return
+    submit_tracks(payloads)
+
+
+def run_genome_jobs(jobs: Iterable[tuple]) -> None:
+    """
+    Runs `process_genome` for each job, either one by one or in a pool of `--workers` threads.
+    Log messages are buffered per genome and printed in job order; the run stops at the first failure.
+    """
+
+    if args.workers == 1:
+        for job in jobs:
+            process_genome(*job)
+        return
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(run_buffered, process_genome, *job))
+            if len(pending) >= 2 * args.workers:  # keep a bounded queue
+                print_job_result(pending.popleft().result())
+        while pending:
+            print_job_result(pending.popleft().result())
+
+
+def run_buffered(func: Callable, *func_args) -> tuple[list[object], str]:
+    """Runs a function in a worker thread, returns its log messages and error message (if any)."""
+    if stop_event.is_set():
+        return [], ""
+    thread_data.buffer = []
+    try:
+        func(*func_args)
+        return thread_data.buffer, ""
+    except SubmissionError as e:
+        return thread_data.buffer, str(e)
+    except Exception as e:  # e.g. connection errors: stop the run as well
+        stop_event.set()
+        return thread_data.buffer, f"Error: {type(e).__name__}: {e}"
+    finally:
+        thread_data.buffer = None
+
+
+def print_job_result(result: tuple[list[object], str]) -> None:
+    messages, error = result
+    for msg in messages:
+        log(msg)
+    if error:
+        fail(error)
 
 
 # 2) Load the payload template(s) for each track type (datafile name)
-def match_template(genome_id: str, datafile: str) -> None:
+def match_template(genome_id: str, datafile: str) -> list[TrackData]:
     """
     Matches a datafile to corresponding track template(s) and forwards it together with 
         the input genome ID (and the datafile name when needed) to `apply_template` function.
+        Returns the resulting track payloads.
     Args:
         genome_id (str): UUID of the genome currently being processed.
         datafile (str): The name of the datafile currently being processed.
@@ -295,44 +537,35 @@ def match_template(genome_id: str, datafile: str) -> None:
         - Skips datafiles that are not in the input args (if provided),
             do not have a dedicated track entry ("variant-details", "*-summary"),
             or do not have a matching template (prints a warning).
-        - Handles these matching scenarios in the following order:
+        - Handles these matching scenarios in the following order (see `TemplateIndex.match`):
             - Exact match between the datafile name and a template name:
               single track is submitted per datafile.
-            - Partial match for templates starting with the datafile name:
-              single datafile results in multiple tracks.
             - Partial match for datafiles starting with the template name:
               single datafile => single track, template matches different datafiles (fallback).
+            - Partial match for templates starting with the datafile name:
+              single datafile results in multiple tracks.
     """
 
     if args.files and not args.templates and datafile not in args.files:
-        return
+        return []
     filename = os.path.splitext(datafile)[0]
     # skip datafiles without dedicated track record in Track API: 
     # variant focus tracks, zoom-out view (only zoom-in view datafile is processed)
     if filename == "variant-details" or filename.endswith("-summary"):
-        return
-    # exact datafile=>template name match
-    if filename in templates:
-        apply_template(genome_id, filename)
-        return
-    # partial name match (multiple tracks per datafile or vice versa)
-    multimatch = False
-    for template_name in templates:
-        # multiple templates (tracks) per datafile (e.g. transcripts.bb)
-        if template_name.startswith(filename):
-            apply_template(genome_id, template_name)
-            multimatch = True
-        # template matches a datafile with different suffix (e.g. repeats.repeatmask*.bb)
-        if not multimatch and filename.startswith(template_name):
-            apply_template(genome_id, template_name, datafile)
-            return
+        return []
+    matches = templates.match(filename)
     # unexpected datafile
-    if not multimatch:
+    if not matches:
         log(f"Warning: No track template found for {datafile}")
+    # fallback: template matches a datafile with different suffix (e.g. repeats.repeatmask*.bb)
+    return [
+        apply_template(genome_id, template_name, datafile if fallback else "")
+        for template_name, fallback in matches
+    ]
 
 
 # 3) Fill in the template (update variable fields/placeholders)
-def apply_template(genome_id: str, template_name: str, datafile: str = "") -> None:
+def apply_template(genome_id: str, template_name: str, datafile: str = "") -> TrackData:
     """
     Updates a track template to generate track payload for a given genome/track.
 
@@ -345,10 +578,9 @@ def apply_template(genome_id: str, template_name: str, datafile: str = "") -> No
         - Uses the `genome_id` field in the track template.
         - Updates the `datafile` field(s) in the track template when needed.
         - Updates species-specific fields for gene and variation tracks.
-        - Submits the generated track data payload using the `submit_track` function.
+        - Returns the generated track data payload (submitted with `submit_track` or `sync_tracks` function).
     """
-    with open(f"{template_dir}/{template_name}{EXT}", "r") as template_file:
-        track_data: TrackData = yaml.safe_load(template_file)
+    track_data = templates.get(template_name)
     track_data["genome_id"] = genome_id  # always updated
     # update datafile field (when template matches multiple datafiles)
     if datafile:
@@ -388,8 +620,27 @@ def apply_template(genome_id: str, template_name: str, datafile: str = "") -> No
         # every species is expected to have descriptions for its gene tracks in metadata
         elif track_type == "gene":
             log("Warning: Missing gene track descriptions.")
-    # submit the track payload
-    submit_track(track_data)
+    return track_data
+
+
+# 3b) Add the datafile headers to track payloads (and check that the datafiles are valid)
+def add_datafile_info(payloads: list[TrackData], manifest: Manifest) -> None:
+    """
+    Sets `datafile_info` field of track payloads (datafile info keyed like `datafiles` field) from the manifest of the genome.
+    Track API stores the chromosome lists once per genome and refers to them from the tracks (see `chromosome_set_info`).
+    Logs a warning for invalid datafiles and datafiles referenced by a track but missing from the data directory.
+    """
+
+    headers, errors = manifest
+    for filename, error in sorted(errors.items()):
+        log(f"Warning: Invalid datafile {filename}: {error}")
+    for track_data in payloads:
+        track_data["datafile_info"] = {}
+        for key, filename in track_data["datafiles"].items():
+            if filename in headers:
+                track_data["datafile_info"][key] = headers[filename]
+            elif filename and filename not in errors:
+                log(f"Warning: Datafile {filename} of track {track_data['label']} not found")
 
 
 # 4) Submit the track payload to Track API
@@ -411,13 +662,14 @@ def submit_track(track_data: TrackData, second_try: bool = False) -> None:
         return
 
     try:
-        request = requests.post(f"{track_api_url}/track", json=track_data)
+        request = session.post(f"{track_api_url}/track", json=track_data)
     except requests.exceptions.ConnectTimeout:
         if second_try:
             fail("Error: No response from Track API.")
         else:
             log("Connection timed out. Retrying...")
             submit_track(track_data, True)
+        return
 
     msg = request.content.decode()
     if request.status_code == 201:
@@ -430,20 +682,192 @@ def submit_track(track_data: TrackData, second_try: bool = False) -> None:
         )
 
 
+def submit_tracks(payloads: list[TrackData], second_try: bool = False) -> None:
+    """
+    Submits the track payloads of a genome to the Track API in a single bulk request.
+    Args:
+        payloads (list[TrackData]): The track payloads to be submitted.
+        second_try (bool, optional): Indicates whether this is a retry attempt after a timeout.
+    Notes:
+        - If `--dryrun` flag is set in cli args, it logs the payloads without submission.
+        - Skips the tracks that already exist (same as `submit_track`).
+        - Logs the error and exits the script if any other track is rejected.
+    """
+
+    if not second_try:
+        for track_data in payloads:
+            log(f"Submitting track: {track_data['label']}")
+            if args.dry_run:
+                log(track_data)
+    if not payloads or args.dry_run:
+        return
+
+    try:
+        request = session.post(f"{track_api_url}/tracks", json=payloads)
+    except requests.exceptions.ConnectTimeout:
+        if second_try:
+            fail("Error: No response from Track API.")
+        else:
+            log("Connection timed out. Retrying...")
+            submit_tracks(payloads, True)
+        return
+
+    msg = request.content.decode()
+    if request.status_code == 400 and "unique" in msg:  # the whole batch was rolled back: submit the tracks one by one
+        log("Bulk submission hit an existing track, submitting tracks one by one.")
+        for track_data in payloads:
+            submit_track(track_data)
+        return
+    try:  # per-track results in payload order: {"track_id": "some-uuid"} or {"error": "..."}
+        results = request.json()["tracks"] if request.status_code in (201, 207, 400) else None
+    except (ValueError, KeyError):
+        results = None
+    if results is None:
+        fail(f"Error submitting tracks ({request.status_code}): {msg[:100]}")
+    for track_data, result in zip(payloads, results):
+        if "track_id" in result:
+            log(f"{track_data['label']}: {result['track_id']}")
+        elif "already exists" in result["error"]:
+            log(f"Track {track_data['label']} already exists, skipping.")
+        else:
+            fail(f"Error submitting track: {result['error'][:100]}\nTrack payload: {track_data}")
+
+
+# 4b) Incremental update: submit only the tracks that differ from the existing ones (--sync)
+TRACK_DEFAULTS = {
+    "additional_info": "",
+    "colour": "",
+    "description": "",
+    "display_order": 2000,
+    "on_by_default": False,
+    "settings": {},
+    "sources": [],
+    "datafile_info": {},
+}
+
+
+def track_key(track_data: dict) -> tuple[str, str, str]:
+    """Fields in the unique track constraint in Track API (genome ID excluded)."""
+    return (
+        track_data["label"],
+        track_data.get("additional_info", ""),
+        json.dumps(track_data["datafiles"], sort_keys=True),
+    )
+
+
+def chromosome_set_info(info: dict) -> dict:
+    """Datafile info as stored in Track API: chromosome list replaced by the digest of the chromosome set and its size."""
+    if not isinstance(info, dict) or "chromosomes" not in info:
+        return info
+    chromosomes = info["chromosomes"]
+    digest = hashlib.md5("\n".join(chromosomes).encode()).hexdigest()
+    return {**{field: value for field, value in info.items() if field != "chromosomes"}, "chromosome_set": digest, "chromosome_count": len(chromosomes)}
+
+
+def normalise_track(track_data: dict) -> dict:
+    """Track fields in comparable form (defaults filled in, Track API-generated values removed)."""
+    track = {**TRACK_DEFAULTS, **track_data}
+    trigger = list(track["trigger"])
+    if "track_id" in track and trigger[-1] == track["track_id"]:  # expansion track hack
+        trigger.pop()
+    return {
+        **{field: track[field] for field in TRACK_DEFAULTS if field not in ("sources", "datafile_info")},
+        "category": track["category"]["track_category_id"],
+        "datafile_info": {key: chromosome_set_info(info) for key, info in track["datafile_info"].items()},
+        "datafiles": track["datafiles"],
+        "label": track["label"],
+        "sources": sorted((source["name"], source["url"]) for source in track["sources"]),
+        "trigger": trigger,
+        "type": track["type"],
+    }
+
+
+def sync_tracks(genome_id: str, payloads: list[TrackData]) -> None:
+    """
+    Compares the track payloads of a genome to its existing tracks in Track API, keyed on the
+    unique track fields (label, additional info, datafiles), and submits only the differences.
+    Notes:
+        - New and changed tracks are submitted in a single bulk request (changed tracks are updated in place).
+        - Tracks that are no longer in the payloads are deleted. Tracks that need to change
+          category or lose sources are deleted and resubmitted (these can't be updated in place).
+    """
+
+    existing = {track_key(track): track for track in fetch_tracks(genome_id)}
+    submissions = []
+    deletions = []
+    for track_data in payloads:
+        track = existing.pop(track_key(track_data), None)
+        if track is None:
+            submissions.append(track_data)
+            continue
+        if "datafile_info" not in track_data:  # headers not read (--no-headers or no data dir): keep the current info
+            track_data = {**track_data, "datafile_info": track.get("datafile_info", {})}
+        current, new = normalise_track(track), normalise_track(track_data)
+        if current == new:
+            continue
+        if current["category"] != new["category"] or not set(current["sources"]) <= set(new["sources"]):
+            deletions.append(track)
+        submissions.append(track_data)
+    deletions += existing.values()
+    log(f"Sync: {len(submissions)} new/changed tracks, {len(deletions)} tracks to delete, {len(payloads) - len(submissions)} unchanged")
+    for track in deletions:
+        log(f"Deleting track: {track['label']}")
+        if not args.dry_run:
+            request = session.delete(f"{track_api_url}/track/{track['track_id']}")
+            if request.status_code not in (204, 404):
+                fail(f"Error deleting track {track['track_id']} ({request.status_code}): {request.content.decode()[:100]}")
+    submit_tracks(submissions)
+
+
+def fetch_tracks(genome_id: str) -> list[dict]:
+    request = session.get(f"{track_api_url}/tracks", params={"genome_id": genome_id, **release_params()})
+    if request.status_code != 200:
+        fail(f"Error fetching tracks for {genome_id} ({request.status_code}): {request.content.decode()[:100]}")
+    return request.json()["tracks"]
+
+
 # Do track cleanup in overwrite mode
 def delete_tracks(genome_id: str) -> None:
-    request = requests.delete(f"{track_api_url}/track_categories/{genome_id}")
+    request = session.delete(f"{track_api_url}/track_categories/{genome_id}", params=release_params())
     if request.status_code != 204 and request.status_code != 404:
         log(f"Could not delete tracks for {genome_id}: {request.content.decode()}")
 
 
+
+# 5) Staged load (--stage): tracks are loaded into a separate release and made live once all genomes are submitted
+def release_params() -> dict[str, str]:
+    """Query parameters selecting the staged release in Track API requests (if any)."""
+    return {"release": args.stage} if args.stage else {}
+
+
+def check_stage_release() -> None:
+    """Makes sure the staged release is not live yet (an unfinished load can be resumed)."""
+    request = session.get(f"{track_api_url}/releases")
+    if request.status_code != 200:
+        fail(f"Error fetching Track API releases ({request.status_code}): {request.content.decode()[:100]}")
+    releases = {release["name"]: release for release in request.json()["releases"]}
+    if args.stage in releases:
+        if releases[args.stage]["activated"]:
+            fail(f"Error: Release {args.stage} has already been made live, please use a new name.")
+        log(f"Resuming the load of release {args.stage}")
+
+
+def activate_release() -> None:
+    request = session.post(f"{track_api_url}/release/{args.stage}/activate")
+    if request.status_code != 200:
+        fail(f"Error activating release {args.stage} ({request.status_code}): {request.content.decode()[:100]}")
+    log(f"Release {args.stage} is live for {request.json()['genomes']} genomes")
+
+
 if __name__ == "__main__":
     # setup
     process_input_parameters()
 
     # get gene/variant tracks metadata (species-specific track descriptions)
     # gene track metadata loaded from database, variant track data from CSV
-    metadata["gene"] = get_gene_desc(release=args.release, genomes=args.genomes)
+    metadata["gene"] = get_gene_desc(
+        release=args.release, genomes=args.genomes, cache_dir=args.metadata_cache, workers=args.workers
+    )
     metadata["variant"] = parse_csv(VARIANT_CSV_FILE)
     if not metadata["gene"]:
         genome_list = f" matching {', '.join(args.genomes)}" if args.genomes else ""
@@ -465,11 +889,15 @@ if __name__ == "__main__":
     # run the track loading process
     if track_api_url:
         log(f"Submitting tracks to {track_api_url}")
+    if args.stage:
+        check_stage_release()
     if args.genomes and (args.files or args.templates):
         process_track_list()
     elif data_dir:
         process_data_dir()
     else:
         fail("Please provide either a data directory or a list of tracks (genomes+template names) to be loaded.")
+    if args.stage:
+        activate_release()
     if logfile:
         logfile.close()
@@ -0,0 +1,109 @@
+"""
+Tests for bbi.py (run from utils dir: python -m unittest)
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+
+import bbi
+
+BIGBED_MAGIC, BIGWIG_MAGIC = 0x8789F2EB, 0x888FFC26
+
+
+def write_bbi(path: str, magic: int, chromosomes: list[str], zoom_levels: list[int], bases_covered: int = 1000,
+              endian: str = "<", block_size: int = 2, size: int = 0) -> None:
+    """Writes a minimal bigBed/bigWig file: header, zoom headers, total summary and chromosome B+ tree (no data)."""
+    key_size = max(len(name) for name in chromosomes)
+    item_size = key_size + 8
+    keys = [name.encode().ljust(key_size, b"\0") for name in sorted(chromosomes)]
+    # B+ tree levels from the leaves up: nodes as lists of (key, chromosome id or child node index)
+    levels = [[[(key, i) for i, key in enumerate(keys)][j : j + block_size] for j in range(0, len(keys), block_size)]]
+    while len(levels[0]) > 1:
+        levels.insert(0, [[(levels[0][j][0][0], j + k) for k in range(len(levels[0][j : j + block_size]))]
+                          for j in range(0, len(levels[0]), block_size)])
+    zoom_offset = 64
+    summary_offset = zoom_offset + 24 * len(zoom_levels)
+    tree_offset = summary_offset + 40
+    node_offsets = []
+    offset = tree_offset + 32
+    for level in levels:  # root first
+        node_offsets.append([])
+        for node in level:
+            node_offsets[-1].append(offset)
+            offset += 4 + len(node) * item_size
+    data = struct.pack(f"{endian}IHHQQQHHQQIQ", magic, 4, len(zoom_levels), tree_offset, offset, offset, 3, 3, 0,
+                       summary_offset, 0, 0)
+    for reduction in zoom_levels:
+        data += struct.pack(f"{endian}IIQQ", reduction, 0, offset, offset)
+    data += struct.pack(f"{endian}Qdddd", bases_covered, 0, 1, 2, 3)
+    data += struct.pack(f"{endian}IIIIQQ", bbi.CHROM_TREE_MAGIC, block_size, key_size, 8, len(keys), 0)
+    for depth, level in enumerate(levels):
+        is_leaf = depth == len(levels) - 1
+        for node in level:
+            data += struct.pack(f"{endian}BxH", is_leaf, len(node))
+            for key, value in node:
+                data += key + (struct.pack(f"{endian}II", value, 1000) if is_leaf else struct.pack(f"{endian}Q", node_offsets[depth + 1][value]))
+    with open(path, "wb") as datafile:
+        datafile.write(data)
+        if size:
+            datafile.truncate(size)  # sparse file
+
+
+class ReadHeaderTest(unittest.TestCase):
+    chromosomes = ["1", "10", "2", "MT", "X", "Y", "scaffold_1"]
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+
+    def test_formats(self):
+        for magic, file_format in [(BIGBED_MAGIC, "bigBed"), (BIGWIG_MAGIC, "bigWig")]:
+            for endian in "<>":
+                with self.subTest(file_format=file_format, endian=endian):
+                    path = f"{self.dir}/track.{file_format}"
+                    write_bbi(path, magic, self.chromosomes, [10, 40, 160], endian=endian)
+                    self.assertEqual(bbi.read_header(path), {
+                        "format": file_format,
+                        "size": os.path.getsize(path),
+                        "zoom_levels": [10, 40, 160],
+                        "bases_covered": 1000,
+                        "chromosomes": sorted(self.chromosomes),
+                    })
+
+    def test_tree_depth(self):
+        chromosomes = [f"chr{i}" for i in range(100)]
+        for block_size in [2, 3, 256]:
+            with self.subTest(block_size=block_size):
+                write_bbi(f"{self.dir}/track.bb", BIGBED_MAGIC, chromosomes, [], block_size=block_size)
+                self.assertEqual(bbi.read_header(f"{self.dir}/track.bb")["chromosomes"], sorted(chromosomes))
+
+    def test_large_file(self):
+        path = f"{self.dir}/large.bw"
+        write_bbi(path, BIGWIG_MAGIC, self.chromosomes, [10], size=5 * 2**30)  # only the header is read
+        self.assertEqual(bbi.read_header(path)["size"], 5 * 2**30)
+
+    def test_invalid_files(self):
+        write_bbi(f"{self.dir}/valid.bb", BIGBED_MAGIC, self.chromosomes, [10])
+        with open(f"{self.dir}/valid.bb", "rb") as datafile:
+            data = datafile.read()
+        files = {
+            "empty.bb": b"",
+            "text.bb": b"track type=bigBed\n" * 10,
+            "truncated.bb": data[:-10],
+            "bad_tree.bb": data[:128] + b"\0\0\0\0" + data[132:],  # chromosome tree magic
+        }
+        for filename, content in files.items():
+            with open(f"{self.dir}/{filename}", "wb") as datafile:
+                datafile.write(content)
+            with self.subTest(filename=filename), self.assertRaises(bbi.InvalidDatafile):
+                bbi.read_header(f"{self.dir}/{filename}")
+        manifest, errors = bbi.build_manifest(self.dir, ["valid.bb", "missing.bb", *files], workers=2)
+        self.assertEqual(list(manifest), ["valid.bb"])
+        self.assertEqual(sorted(errors), sorted(["missing.bb", *files]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for get_gene_track_desc.py, using SQLite databases in place of MySQL core DBs
+(run from utils dir: python -m unittest)
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import get_gene_track_desc as desc
+
+META_ROWS = {
+    "core_a": [(1, "genebuild.annotation_source", "ensembl"), (1, "genebuild.provider_name", "Ensembl"),
+               (1, "genebuild.provider_url", "https://ensembl.org")],
+    "core_b": [(1, "genebuild.annotation_source", "refseq"), (1, "genebuild.provider_name", "NCBI"),
+               (1, "genebuild.provider_url", "https://ncbi.nlm.nih.gov")],
+    "core_c": [(2, "genebuild.annotation_source", "community"), (2, "genebuild.provider_name", "Lab 2"),
+               (2, "genebuild.provider_url", "https://lab2.org"), (1, "genebuild.annotation_source", "ensembl"),
+               (1, "genebuild.provider_name", "Lab 1"), (1, "genebuild.provider_url", "https://lab1.org")],
+    "core_d": [(1, "genebuild.provider_name", "Unknown"), (1, "species.name", "unknown")],
+    "core_e": [(1, "genebuild.annotation_source", "Ensembl"), (1, "genebuild.provider_name", "Ensembl"),
+               (1, "genebuild.provider_url", "https://ensembl.org")],
+}
+DBS = [(f"species_{db[-1]}", f"uuid-{db[-1]}", db) for db in META_ROWS]
+
+
+class SQLiteServer:
+    """Stand-in for a MySQL server: each core DB is an SQLite file attached as a schema."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connections = 0
+        for dbname, rows in META_ROWS.items():
+            conx = sqlite3.connect(os.path.join(path, f"{dbname}.db"))
+            conx.execute("create table meta (species_id int, meta_key text, meta_value text)")
+            conx.executemany("insert into meta values (?, ?, ?)", rows)
+            conx.commit()
+            conx.close()
+
+    def connect(self) -> sqlite3.Connection:
+        self.connections += 1
+        conx = sqlite3.connect(":memory:", check_same_thread=False)
+        for dbname in META_ROWS:
+            conx.execute(f"attach database '{os.path.join(self.path, dbname)}.db' as {dbname}")
+        return conx
+
+
+class GeneTrackDescTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+        self.server = SQLiteServer(self.tmpdir)
+
+    def test_batch_matches_single_queries(self):
+        conx = self.server.connect()
+        expected = {dbname: desc.get_analysis_src_info(conx, dbname) for dbname in META_ROWS if dbname != "core_c"}
+        batch = desc.get_analysis_src_info_batch(conx, list(META_ROWS))
+        self.assertEqual({dbname: info for dbname, info in batch.items() if dbname != "core_c"}, expected)
+        # multi-species DB: first species is used
+        self.assertEqual(batch["core_c"], desc.SrcInfo("Lab 1", "https://lab1.org", True))
+        self.assertEqual(batch["core_d"], desc.SrcInfo("Unknown", None, False))
+
+    def test_chunks_and_workers(self):
+        expected = desc.get_analysis_src_info_batch(self.server.connect(), list(META_ROWS))
+        for chunk_size, workers in [(1, 1), (2, 2), (2, 8), (10, 3)]:
+            with self.subTest(chunk_size=chunk_size, workers=workers):
+                self.server.connections = 0
+                result = desc.fetch_src_info(list(META_ROWS), self.server.connect, chunk_size, workers)
+                self.assertEqual(result, expected)
+                self.assertEqual(self.server.connections, min(workers, -(-len(META_ROWS) // chunk_size)))
+
+    def test_cache(self):
+        cache_dir = os.path.join(self.tmpdir, "cache")
+        with mock.patch("builtins.print"), mock.patch.object(desc, "get_metadb_connection"), \
+             mock.patch.object(desc, "get_ensro_connection", self.server.connect), \
+             mock.patch.object(desc, "get_dbs", side_effect=lambda conx, release, genomes: [
+                 db for db in DBS if genomes is None or db[1] in genomes]) as get_dbs:
+            subset = desc.main(5, genomes=["uuid-a", "uuid-b"], cache_dir=cache_dir)
+            self.assertEqual(list(subset), ["uuid-a", "uuid-b"])
+            self.assertEqual(subset["uuid-b"]["description"], "Imported")
+            desc.main(5, genomes=["uuid-b"], cache_dir=cache_dir)  # cached
+            self.assertEqual(get_dbs.call_count, 1)
+            desc.main(5, genomes=["uuid-b", "uuid-c"], cache_dir=cache_dir)  # only uuid-c is looked up
+            self.assertEqual(get_dbs.call_args.kwargs["genomes"], ["uuid-c"])
+            everything = desc.main(5, cache_dir=cache_dir)
+            self.assertEqual(len(everything), len(DBS))
+            self.assertEqual(desc.main(5, cache_dir=cache_dir), everything)  # complete release cached
+            self.assertEqual(desc.main(5, genomes=["uuid-x"], cache_dir=cache_dir), {})  # not in release
+            self.assertEqual(get_dbs.call_count, 3)
+            self.assertEqual(desc.main(6, genomes=["uuid-a"], cache_dir=cache_dir)["uuid-a"]["description"], "Annotated")
+            self.assertEqual(get_dbs.call_count, 4)  # cache is per release
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,381 @@
+"""
+Tests for submit_tracks.py (run from utils dir: python -m unittest)
+"""
+
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
+
+import bbi
+import requests
+import submit_tracks
+from test_bbi import BIGBED_MAGIC, write_bbi
+
+
+def linear_match(template_names: list[str], filename: str) -> list[tuple[str, bool]]:
+    """Reference implementation: linear scan over (sorted) template names."""
+    if filename in template_names:
+        return [(filename, False)]
+    matches = []
+    multimatch = False
+    for template_name in template_names:
+        if template_name.startswith(filename):
+            matches.append((template_name, False))
+            multimatch = True
+        if not multimatch and filename.startswith(template_name):
+            return [(template_name, True)]
+    return matches
+
+
+class MatchTemplateTest(unittest.TestCase):
+    # datafile => expected apply_template calls (template name, datafile override)
+    cases = {
+        "gc.bb": [("gc", "")],
+        "contigs.bb": [("contigs", "")],
+        "transcripts.bb": [
+            ("transcripts-gene-other-fwd", ""),
+            ("transcripts-gene-other-rev", ""),
+            ("transcripts-gene-pc-fwd", ""),
+            ("transcripts-gene-pc-rev", ""),
+        ],
+        "simple-features.bb": [("simple-features-cpg", ""), ("simple-features-tssp", "")],
+        "repeats.repeatmask.bb": [("repeats.repeatmask", "")],
+        "repeats.repeatmask_repbase_human.bb": [("repeats.repeatmask_repbase_human", "")],
+        "repeats.repeatmask_rice.bb": [("repeats.repeatmask", "repeats.repeatmask_rice.bb")],
+        "repeats.trf_extra.bb": [("repeats.trf", "repeats.trf_extra.bb")],
+        "variant-eva-details.bb": [("variant-eva-details", "")],
+        "variant-other-details.bb": [("variant", "variant-other-details.bb")],
+        "variant-eva-summary.bw": [],  # zoom-out views are not submitted
+        "variant-details.bb": [],  # variant focus track
+        "gc-summary.bw": [],
+        "unknown.bb": [],
+    }
+
+    def setUp(self):
+        patcher = mock.patch.object(submit_tracks, "args", mock.Mock(files=None, templates=None, quiet=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cases(self):
+        for datafile, expected_calls in self.cases.items():
+            with self.subTest(datafile=datafile), mock.patch.object(submit_tracks, "apply_template") as apply_template:
+                submit_tracks.match_template("genome-id", datafile)
+                self.assertEqual(
+                    apply_template.call_args_list,
+                    [mock.call("genome-id", name, override) for name, override in expected_calls],
+                )
+
+    def test_index_matches_linear_scan(self):
+        names = submit_tracks.templates.names
+        filenames = set(self.cases) | set(names)
+        filenames |= {name[:end] for name in names for end in range(1, len(name))}  # all prefixes
+        filenames |= {f"{name}_suffix" for name in names}
+        for filename in filenames:
+            with self.subTest(filename=filename):
+                self.assertEqual(submit_tracks.templates.match(filename), linear_match(names, filename))
+
+    def test_template_copies(self):
+        track_data = submit_tracks.templates.get("variant")
+        track_data["settings"]["variant-details"]["switches"].clear()
+        self.assertTrue(submit_tracks.templates.get("variant")["settings"]["variant-details"]["switches"])
+
+    def test_filter(self):
+        templates = submit_tracks.templates.filter(["transcripts", "gc"])
+        self.assertEqual(len(templates.names), 5)
+        self.assertEqual(templates.match("repeats.repeatmask"), [])
+
+
+def created_response(url, json):
+    """Track API response to a bulk submission (all tracks created)."""
+    results = {"tracks": [{"track_id": f"track-{i}"} for i in range(len(json))]}
+    return mock.Mock(status_code=201, content=b"{}", json=lambda: results)
+
+
+class SubmitTracksTest(unittest.TestCase):
+    genome_id = "a7335667-93e7-11ec-a39d-005056b38ce3"
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(submit_tracks, "args", mock.Mock(dry_run=False, quiet=True, stage=None, sync=False, overwrite=False)),
+            mock.patch.object(submit_tracks, "session"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = submit_tracks.session
+        self.session.post.side_effect = created_response
+
+    def response(self, status_code, results):
+        return mock.Mock(status_code=status_code, content=json.dumps({"tracks": results}).encode(), json=lambda: {"tracks": results})
+
+    def test_one_request_per_genome(self):
+        files = ["gc", "contigs", "repeats.dust"]
+        submit_tracks.process_genome(self.genome_id, "1/1", files)
+        self.assertEqual(self.session.post.call_count, 1)
+        self.assertTrue(self.session.post.call_args.args[0].endswith("/tracks"))
+        payloads = [track_data for file in files for track_data in submit_tracks.match_template(self.genome_id, file)]
+        self.assertEqual(self.session.post.call_args.kwargs["json"], payloads)
+
+    def test_existing_tracks(self):
+        payloads = [submit_tracks.apply_template(self.genome_id, name) for name in ["gc", "contigs"]]
+        self.session.post.side_effect = None
+        self.session.post.return_value = self.response(207, [{"track_id": "track-0"}, {"error": "Track already exists in category repeats"}])
+        submit_tracks.submit_tracks(payloads)  # skipped
+        self.session.post.return_value = self.response(400, [{"error": "Payload validation failed: {}"}, {"track_id": "track-1"}])
+        with mock.patch.object(submit_tracks, "fail", side_effect=SystemExit) as fail, self.assertRaises(SystemExit):
+            submit_tracks.submit_tracks(payloads)
+        self.assertIn("Payload validation failed", fail.call_args.args[0])
+
+    def test_rolled_back_batch(self):
+        payloads = [submit_tracks.apply_template(self.genome_id, name) for name in ["gc", "contigs"]]
+        self.session.post.side_effect = [
+            mock.Mock(status_code=400, content=b'{"error": "Track already exists: duplicate key value violates unique constraint"}'),
+            mock.Mock(status_code=201, content=b'{"track_id": "track-0"}'),
+            mock.Mock(status_code=400, content=b'{"error": "duplicate key value violates unique constraint"}'),
+        ]
+        submit_tracks.submit_tracks(payloads)  # resubmitted one by one, existing track skipped
+        self.assertEqual([call.args[0].rsplit("/", 1)[1] for call in self.session.post.call_args_list], ["tracks", "track", "track"])
+
+
+class SyncTracksTest(unittest.TestCase):
+    genome_id = "a7335667-93e7-11ec-a39d-005056b38ce3"
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(submit_tracks, "args", mock.Mock(dry_run=False, quiet=True, stage=None)),
+            mock.patch.object(submit_tracks, "session"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = submit_tracks.session
+        self.session.post.side_effect = created_response
+        self.session.delete.return_value = mock.Mock(status_code=204)
+        self.payloads = [
+            submit_tracks.apply_template(self.genome_id, name)
+            for name in ["gc", "contigs", "repeats.dust", "variant-eva-details"]
+        ]
+        self.existing = [self.stored_track(track_data, f"track-{i}") for i, track_data in enumerate(self.payloads)]
+
+    @staticmethod
+    def stored_track(track_data, track_id):
+        """Track record as returned by Track API."""
+        track = {**copy.deepcopy(submit_tracks.TRACK_DEFAULTS), **copy.deepcopy(track_data), "track_id": track_id}
+        if track["trigger"][1].startswith("expand"):
+            track["trigger"].append(track_id)
+        return track
+
+    def sync(self, payloads):
+        self.session.get.return_value = mock.Mock(status_code=200, json=lambda: {"tracks": self.existing})
+        submit_tracks.sync_tracks(self.genome_id, payloads)
+        submitted = self.session.post.call_args.kwargs["json"] if self.session.post.called else []
+        deleted = [call.args[0].rsplit("/", 1)[1] for call in self.session.delete.call_args_list]
+        return [track["label"] for track in submitted], deleted
+
+    def test_unchanged(self):
+        self.assertEqual(self.sync(copy.deepcopy(self.payloads)), ([], []))
+
+    def test_changes(self):
+        payloads = copy.deepcopy(self.payloads[1:])  # gc track removed
+        payloads[0]["description"] = "Updated"  # contigs
+        payloads[1]["category"]["track_category_id"] = "repeats"  # repeats.dust
+        payloads.append(submit_tracks.apply_template(self.genome_id, "variant-dbsnp-details"))
+        submitted, deleted = self.sync(payloads)
+        self.assertEqual(submitted, [payloads[0]["label"], "Low complexity: Dust", payloads[3]["label"]])
+        self.assertEqual(deleted, ["track-2", "track-0"])
+
+    def test_sources(self):
+        payloads = copy.deepcopy(self.payloads)
+        payloads[0]["sources"] = [{"name": "New", "url": "https://new.org"}]  # added source: updated in place
+        payloads[2]["sources"] = []  # removed source: resubmitted
+        self.assertEqual(self.sync(payloads), (["%GC", "Low complexity: Dust"], ["track-2"]))
+
+    def test_chromosome_sets(self):
+        payloads = copy.deepcopy(self.payloads)
+        payloads[0]["datafile_info"] = {"gc": {"format": "bigBed", "chromosomes": ["1", "2"]}}
+        digest = hashlib.md5(b"1\n2").hexdigest()  # stored by Track API as a chromosome set reference
+        self.existing[0]["datafile_info"] = {"gc": {"format": "bigBed", "chromosome_set": digest, "chromosome_count": 2}}
+        self.assertEqual(self.sync(copy.deepcopy(payloads)), ([], []))
+        payloads[0]["datafile_info"]["gc"]["chromosomes"].append("X")
+        self.assertEqual(self.sync(payloads), (["%GC"], []))
+
+    def test_staged_release(self):
+        submit_tracks.args.stage = "beta-5"
+        submitted, deleted = self.sync(copy.deepcopy(self.payloads))
+        self.assertEqual(self.session.get.call_args.kwargs["params"], {"genome_id": self.genome_id, "release": "beta-5"})
+        self.assertEqual((submitted, deleted), ([], []))
+        self.session.get.return_value = mock.Mock(status_code=200, json=lambda: {"releases": [{"name": "beta-5", "activated": "2024-01-01T00:00:00Z"}]})
+        with mock.patch.object(submit_tracks, "fail", side_effect=SystemExit) as fail, self.assertRaises(SystemExit):
+            submit_tracks.check_stage_release()  # already live
+        self.assertIn("already been made live", fail.call_args.args[0])
+
+
+class ProcessDataDirTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.genomes = {}
+        for i in range(20):  # genome dirs with datafiles (and other files)
+            genome_id = str(uuid.uuid4())
+            self.genomes[genome_id] = [f"gc{i}.bb", f"variant-{i}-summary.bw"]
+            os.mkdir(f"{tmp_dir.name}/{genome_id}")
+            for filename in self.genomes[genome_id] + ["README.txt"]:
+                open(f"{tmp_dir.name}/{genome_id}/{filename}", "w").close()
+        os.mkdir(f"{tmp_dir.name}/not-a-genome")
+        open(f"{tmp_dir.name}/{uuid.uuid4()}", "w").close()  # file, not a directory
+        patchers = [
+            mock.patch.object(submit_tracks, "args", mock.Mock(genomes=None, resume=None, quiet=True, workers=1, scan_workers=2, no_headers=True)),
+            mock.patch.object(submit_tracks, "data_dir", tmp_dir.name),
+            mock.patch.object(submit_tracks, "process_genome"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def processed(self):
+        submit_tracks.process_data_dir()
+        return {call.args[0]: sorted(call.args[2]) for call in submit_tracks.process_genome.call_args_list}
+
+    def test_all_genomes(self):
+        self.assertEqual(self.processed(), self.genomes)
+        progress = [call.args[1] for call in submit_tracks.process_genome.call_args_list]
+        self.assertEqual(progress[-1], "20/22")  # out of all data dir entries
+
+    def test_selected_genomes(self):
+        genome_ids = sorted(self.genomes)[:3]
+        submit_tracks.args.genomes = genome_ids
+        self.assertEqual(sorted(self.processed()), genome_ids)
+        submit_tracks.args.genomes = genome_ids + [str(uuid.uuid4())]
+        with mock.patch.object(submit_tracks, "fail", side_effect=SystemExit) as fail, self.assertRaises(SystemExit):
+            submit_tracks.process_data_dir()
+        self.assertIn("missing in data directory", fail.call_args.args[0])
+
+    def test_resume(self):
+        with os.scandir(submit_tracks.data_dir) as it:
+            genome_ids = [entry.name for entry in it if entry.name in self.genomes]
+        submit_tracks.args.resume = genome_ids[5]
+        self.assertEqual(list(self.processed()), genome_ids[5:])
+
+    def test_skipped_genomes_log(self):
+        with os.scandir(submit_tracks.data_dir) as it:
+            genome_ids = [entry.name for entry in it if entry.name in self.genomes]
+        submit_tracks.args.resume = genome_ids[5]
+        submit_tracks.args.quiet = False
+        submit_tracks.args.workers = 3
+        submit_tracks.process_genome.side_effect = lambda genome_id, *args: submit_tracks.log(f"Processing genome {genome_id}")
+        scandir = os.scandir
+        def scandir_genomes_first(path):  # non-genome entries last
+            if path != submit_tracks.data_dir:
+                return scandir(path)
+            with scandir(path) as it:
+                return contextlib.nullcontext(sorted(it, key=lambda entry: entry.name not in self.genomes))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), mock.patch.object(submit_tracks.os, "scandir", side_effect=scandir_genomes_first):
+            submit_tracks.process_data_dir()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 21)
+        self.assertTrue(all(line.startswith("Skipping") for line in lines[:6]))  # not between the buffered genome output
+        self.assertEqual(lines[6:], [f"Processing genome {genome_id}" for genome_id in genome_ids[5:]])
+
+    def test_streaming(self):
+        listed = []
+        list_datafiles = submit_tracks.list_datafiles
+        with mock.patch.object(submit_tracks, "list_datafiles", side_effect=lambda path: listed.append(path) or list_datafiles(path)):
+            with os.scandir(submit_tracks.data_dir) as it:
+                entries = [(entry.name, entry.is_dir()) for entry in it]
+            jobs = submit_tracks.scan_genomes(submit_tracks.select_genomes(entries))
+            genome_id, progress, datafiles, manifest = next(jobs)  # first genome is ready before the others are listed
+            self.assertEqual(sorted(datafiles), self.genomes[genome_id])
+            self.assertLessEqual(len(listed), 2 * submit_tracks.args.scan_workers)
+            self.assertEqual(len(list(jobs)), 19)
+        self.assertEqual(len(listed), 20)
+
+    def test_datafile_info(self):
+        genome_id = sorted(self.genomes)[0]
+        genome_dir = f"{submit_tracks.data_dir}/{genome_id}"
+        write_bbi(f"{genome_dir}/gc.bb", BIGBED_MAGIC, ["1", "2"], [10])
+        submit_tracks.args.genomes = [genome_id]
+        submit_tracks.args.no_headers = False
+        submit_tracks.process_data_dir()
+        datafiles, manifest = submit_tracks.process_genome.call_args.args[2:]
+        self.assertEqual(sorted(manifest[0]), ["gc.bb"])
+        self.assertEqual(sorted(manifest[1]), self.genomes[genome_id])  # empty files
+        payloads = [submit_tracks.apply_template(genome_id, name) for name in ["gc", "contigs"]]
+        with mock.patch.object(submit_tracks, "log") as log:
+            submit_tracks.add_datafile_info(payloads, manifest)
+        self.assertEqual(payloads[0]["datafile_info"], {"gc": manifest[0]["gc.bb"]})
+        self.assertEqual(manifest[0]["gc.bb"]["chromosomes"], ["1", "2"])
+        self.assertEqual(payloads[1]["datafile_info"], {})
+        messages = [call.args[0] for call in log.call_args_list]
+        self.assertIn("Warning: Datafile contigs.bb of track Reference sequence not found", messages)
+        self.assertEqual(sum(message.startswith("Warning: Invalid datafile") for message in messages), 2)
+
+    def test_header_threads(self):
+        submit_tracks.args.no_headers = False
+        thread_counts = []
+        read_header = bbi.read_header
+        def count_threads(path):
+            thread_counts.append(threading.active_count())
+            return read_header(path)
+        baseline = threading.active_count()
+        with mock.patch.object(bbi, "read_header", side_effect=count_threads):
+            self.assertEqual(self.processed(), self.genomes)
+        self.assertEqual(len(thread_counts), 40)
+        self.assertLessEqual(max(thread_counts), baseline + submit_tracks.args.scan_workers)  # no nested pools
+
+
+class GenomeWorkersTest(unittest.TestCase):
+    genome_ids = [f"genome-{i}" for i in range(12)]
+
+    def setUp(self):
+        self.started = []
+        patchers = [
+            mock.patch.object(submit_tracks, "args", mock.Mock(quiet=False, workers=3)),
+            mock.patch.object(submit_tracks, "process_genome", side_effect=self.process_genome),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(submit_tracks.stop_event.clear)
+        self.failing = None
+
+    def process_genome(self, genome_id, progress, files):
+        self.started.append(genome_id)
+        submit_tracks.log(f"Processing genome {genome_id} ({progress})")
+        if genome_id == self.failing:
+            raise requests.exceptions.ConnectionError("Connection refused")
+        time.sleep(random.random() * 0.02)  # genomes finish out of order
+        submit_tracks.log(f"Done: {genome_id}")
+
+    def run_jobs(self):
+        jobs = [(genome_id, f"{i+1}/{len(self.genome_ids)}", []) for i, genome_id in enumerate(self.genome_ids)]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            submit_tracks.run_genome_jobs(jobs)
+        return output.getvalue().splitlines()
+
+    def test_log_order(self):
+        expected = [line for i, genome_id in enumerate(self.genome_ids)
+                    for line in [f"Processing genome {genome_id} ({i+1}/12)", f"Done: {genome_id}"]]
+        self.assertEqual(self.run_jobs(), expected)  # buffered per genome, printed in job order
+
+    def test_stop_on_failure(self):
+        self.failing = "genome-1"
+        with self.assertRaises(SystemExit):
+            self.run_jobs()
+        self.assertLessEqual(set(self.started), {"genome-0", "genome-1", "genome-2"})  # queued genomes are not started
+        self.assertTrue(submit_tracks.stop_event.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()